@@ -0,0 +1 @@
+from benchmarks.generator import synthetic_graph
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import argparse
+import json
+
+import pandas as pd
+
+#Compares two JSON results of benchmarks.run, e.g. of two versions of the code.
+#It returns, for every benchmark and number of workers, the time of both runs and their ratio
+#(new over old: above 1 is a slowdown), as well as the ratio of the peak memory.
+#Usage: python -m benchmarks.compare old.json new.json
+def compare(old, new):
+    old = pd.DataFrame(old['results']).set_index(['benchmark', 'workers'])
+    new = pd.DataFrame(new['results']).set_index(['benchmark', 'workers'])
+    table = old.loc[:,['seconds', 'peak_rss']].join(new.loc[:,['seconds', 'peak_rss']],
+                                                    how = 'inner', lsuffix = '_old', rsuffix = '_new')
+    table.loc[:,'time_ratio'] = table.seconds_new / table.seconds_old
+    table.loc[:,'memory_ratio'] = table.peak_rss_new / table.peak_rss_old
+    return table.reset_index()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Compares two results of benchmarks.run.')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--tolerance', type = float, default = 1.1,
+                        help = 'time ratio above which a benchmark is reported as a regression')
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if old['parameters'] != new['parameters']:
+        print('Warning: the runs have different parameters.')
+
+    table = compare(old, new)
+    print(table.to_string(index = False))
+    regressions = table[table.time_ratio > args.tolerance]
+    if len(regressions) > 0:
+        print('Regressions:', ', '.join(regressions.benchmark + '/' + regressions.workers.astype(str)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+#Generates a synthetic time-evolving graph, in the format expected by EdgeInfluence.
+#n_nodes        number of nodes, whose ids are 1..n_nodes.
+#n_edges        number of distinct edges (p1, p2); self loops are not generated.
+#n_timeframes   number of timeframes, numbered 1..n_timeframes.
+#dim            number of properties of the nodes.
+#persistence    probability that an edge active at a timeframe is still active at the next one.
+#               Every edge is activated at a random timeframe and, once inactive, does not come back,
+#               so that the number of timeframes of an edge is geometric.
+#skew           exponent of the power law of the activity of the nodes: the ends of the edges are
+#               drawn with probability proportional to rank^-skew, giving a skewed degree
+#               distribution (0 for uniform).
+#seed           seed of the random generator.
+#It returns the edges table E <p1, p2, timeframe, weight>, with a row for every timeframe an edge
+#is active in, and the properties table X <characterId, x0, ..., timeframe>, where the properties
+#of every node follow a random walk in [0, 1] over the timeframes.
+def synthetic_graph(n_nodes = 1000, n_edges = 10000, n_timeframes = 10, dim = 4, persistence = 0.5,
+                    skew = 1.0, seed = None):
+    rng = np.random.default_rng(seed)
+    if n_edges > n_nodes * (n_nodes - 1) // 2:
+        raise ValueError('n_edges should be at most n_nodes*(n_nodes-1)/2.')
+
+    #the activity of the nodes follows a power law over a random ranking
+    activity = np.arange(1, n_nodes + 1, dtype = float) ** -skew
+    activity = activity[rng.permutation(n_nodes)]
+    activity /= activity.sum()
+
+    #distinct unordered pairs, drawn by activity until there are enough of them
+    pairs = np.zeros((0, 2), dtype = np.int64)
+    while len(pairs) < n_edges:
+        draw = rng.choice(n_nodes, size = (2 * (n_edges - len(pairs)) + 16, 2), p = activity)
+        draw = draw[draw[:,0] != draw[:,1]]
+        pairs = np.unique(np.r_[pairs, np.sort(draw, axis = 1)], axis = 0)
+    pairs = pairs[rng.permutation(len(pairs))[:n_edges]]
+    #the order of the two ends is random
+    swap = rng.random(n_edges) < 0.5
+    pairs[swap] = pairs[swap][:,::-1]
+
+    #every edge is active for a run of consecutive timeframes
+    start = rng.integers(1, n_timeframes + 1, size = n_edges)
+    length = np.minimum(rng.geometric(1 - persistence, size = n_edges) if persistence < 1
+                        else np.full(n_edges, n_timeframes), n_timeframes - start + 1)
+    edge = np.repeat(np.arange(n_edges), length)
+    timeframe = start[edge] + np.arange(len(edge)) - np.repeat(np.cumsum(length) - length, length)
+
+    E = pd.DataFrame({'p1' : pairs[edge, 0] + 1,
+                      'p2' : pairs[edge, 1] + 1,
+                      'timeframe' : timeframe.astype(float),
+                      'weight' : (rng.poisson(2, size = len(edge)) + 1).astype(float)})
+
+    #the properties of the nodes follow a random walk in [0, 1]
+    steps = rng.normal(0, 0.1, size = (n_nodes, n_timeframes, dim))
+    steps[:,0] = rng.random((n_nodes, dim))
+    values = np.clip(np.cumsum(steps, axis = 1), 0, 1)
+
+    X = pd.DataFrame(values.reshape(-1, dim), columns = ['x' + str(k) for k in range(dim)])
+    X.insert(0, 'characterId', np.repeat(np.arange(1, n_nodes + 1), n_timeframes))
+    X.loc[:,'timeframe'] = np.tile(np.arange(1, n_timeframes + 1), n_nodes)
+
+    return E, X
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import psutil
+
+import sinfpy.semantic_influence as sinf
+from sinfpy.characterization_metrics import retention_transfer
+from benchmarks.generator import synthetic_graph
+
+#Benchmarks of the library on a synthetic time-evolving graph.
+#Every benchmark is run for every number of workers, and reports the best time over the
+#repeats, the throughput in edges (rows of the edges table) per second and the peak memory
+#of the process and of its workers. The results are written as JSON, so that the runs of
+#different versions can be compared with benchmarks.compare.
+#Usage: python -m benchmarks.run --nodes 10000 --edges 100000 --workers 1 2 4 --output results.json
+
+BENCHMARKS = ['edge_dynamic', 'edge_dynamic_balance', 'edge_static', 'edge_static_balance',
+              'node', 'node_stats', 'retention_transfer']
+
+#Samples the resident set size of the process and of its children while running,
+#and keeps the peak.
+class PeakMemory:
+    def __init__(self, interval = 0.01):
+        self.interval = interval
+        self.peak = 0
+
+    def sample(self):
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        for child in process.children(recursive = True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak = max(self.peak, rss)
+
+    def watch(self):
+        while not self.done.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.peak = 0
+        self.sample()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target = self.watch, daemon = True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        self.thread.join()
+        self.sample()
+
+#Runs fn repeat times, and returns its last result, the best time in seconds and the peak memory.
+def measure(fn, repeat):
+    seconds = []
+    peak = 0
+    for _ in range(repeat):
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            result = fn()
+            seconds.append(time.perf_counter() - start)
+        peak = max(peak, memory.peak)
+    return result, min(seconds), peak
+
+#The edges table used by the static benchmarks: one row per edge.
+def static_edges(E):
+    return E.drop_duplicates(['p1', 'p2']).loc[:,['p1', 'p2']].reset_index(drop = True)
+
+#Returns the function running the benchmark name with n_workers on the executor.
+def benchmark(name, E, X, updated_E, n_workers, executor):
+    if name.startswith('edge_'):
+        dynamic = name.startswith('edge_dynamic')
+        balance = name.endswith('_balance')
+        E_run = E if dynamic else static_edges(E)
+        return lambda : sinf.EdgeInfluence(E_run.copy(), X.copy(), dynamic = dynamic,
+                                           balance_inf = balance)(n_workers, executor)
+    if name.startswith('node'):
+        return lambda : sinf.NodeInfluence(updated_E, stats = name == 'node_stats')(n_workers, executor)
+    if name == 'retention_transfer':
+        #the top 10% of the influencers
+        nodes = sinf.NodeInfluence(updated_E)()
+        top = nodes.set_index('node').nlargest(max(1, len(nodes) // 10), 'influence')
+        return lambda : retention_transfer(top, E, X, n_workers = n_workers, executor = executor)
+    raise ValueError('Illegal value for benchmark, no definition for ' + name)
+
+#Number of edges processed by the benchmark name.
+def benchmark_edges(name, E, updated_E):
+    if name.startswith('edge_static'):
+        return len(static_edges(E))
+    if name.startswith('node'):
+        return len(updated_E)
+    return len(E)
+
+#Version of the code the benchmarks run on: the git commit, if available.
+def code_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output = True,
+                              text = True, cwd = os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+#Runs the benchmarks and returns the results: the parameters of the run, the environment,
+#and for every benchmark and number of workers the time, throughput, peak memory and speedup
+#over the first number of workers.
+def run(benchmarks = BENCHMARKS, workers = [1], executor = 'threads', repeat = 3, **graph):
+    E, X = synthetic_graph(**graph)
+    updated_E = sinf.EdgeInfluence(E.copy(), X.copy())()
+
+    results = []
+    for name in benchmarks:
+        edges = benchmark_edges(name, E, updated_E)
+        base = None
+        for n in workers:
+            _, seconds, peak = measure(benchmark(name, E, X, updated_E, n, executor), repeat)
+            base = seconds if base is None else base
+            results.append({'benchmark' : name, 'workers' : n, 'edges' : edges,
+                            'seconds' : seconds, 'edges_per_second' : edges / seconds,
+                            'peak_rss' : peak, 'speedup' : base / seconds})
+            print(name, n, 'workers', round(seconds, 4), 's', round(edges / seconds), 'edges/s',
+                  round(peak / 2**20, 1), 'MB', flush = True)
+
+    return {'version' : code_version(),
+            'environment' : {'python' : platform.python_version(), 'numpy' : np.__version__,
+                             'pandas' : pd.__version__, 'machine' : platform.machine(),
+                             'cpus' : os.cpu_count()},
+            'parameters' : dict(graph, executor = executor, repeat = repeat, rows = len(E)),
+            'results' : results}
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmarks of sinfpy on a synthetic time-evolving graph.')
+    parser.add_argument('--nodes', type = int, default = 10000)
+    parser.add_argument('--edges', type = int, default = 100000)
+    parser.add_argument('--timeframes', type = int, default = 10)
+    parser.add_argument('--dim', type = int, default = 8)
+    parser.add_argument('--persistence', type = float, default = 0.5)
+    parser.add_argument('--skew', type = float, default = 1.0)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--workers', type = int, nargs = '+', default = [1, 2, 4])
+    parser.add_argument('--executor', default = 'threads')
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--benchmarks', nargs = '+', default = BENCHMARKS, choices = BENCHMARKS)
+    parser.add_argument('--output', default = 'benchmark_results.json')
+    args = parser.parse_args(argv)
+
+    results = run(args.benchmarks, args.workers, args.executor, args.repeat,
+                  n_nodes = args.nodes, n_edges = args.edges, n_timeframes = args.timeframes,
+                  dim = args.dim, persistence = args.persistence, skew = args.skew, seed = args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent = 2)
+    print('Results written to', args.output)
+
+if __name__ == '__main__':
+    main()
@@ -1,60 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
+import tempfile
+
 import sinfpy.semantic_influence as sinf
+from sinfpy.io import read_hdf
+from sinfpy.store import write_store
 
+import numpy as np
 import pandas as pd
-import sys
-
-def filereader(filename):
-    with pd.HDFStore(filename, mode = 'r') as hdf:
-        edges_tfs = [name if 'edgelist_tf' in name else '' for name in hdf.keys()]
-        data_tfs = [name if 'X_tf' in name else '' for name in hdf.keys()]
-        E = None
-        X = None
-        
-        if '' in edges_tfs:
-            edges_tfs = list(filter(lambda a: a != '', edges_tfs))
-        if '' in data_tfs:
-            data_tfs = list(filter(lambda a: a != '', data_tfs))
-            
-        if len(data_tfs) == 0 or len(edges_tfs) == 0:
-            print('Something wrong in SN...')
-            sys.exit()
-        else:
-            
-            for i in edges_tfs:
-                if E is None:
-                    E = hdf[i]
-                else:
-                    E = E.append(hdf[i])
-            
-            for i in data_tfs:
-                if X is None:
-                    X = hdf[i]
-                else:
-                    X = X.append(hdf[i])
-    
-    E = E.sort_index()
-    return E.reset_index(),X
 
+#The participation influence in the batched protocol: it receives the properties of all the
+#edges at one step as arrays, and the batched similarity kernel.
+@sinf.batched_influence
+def batched_participation_influence(xi_old, xi_new, xj_old, xj_new, threshold, prev_inf, similarity):
+    sim_i = similarity(xi_old, xi_new)
+    sim_j = similarity(xj_old, xj_new)
+    sim_ij = similarity(xi_new, xj_new)
 
-def participation_influence(xi_old, xi_new, xj_old, xj_new, prev_inf, threshold, similarity):
-    cols = ['assists','deaths','kills','score']
-    influence = 0
-    sim_i = similarity(xi_old.loc[:,cols].iloc[0].values,
-                       xi_new.loc[:,cols].iloc[0].values)
-    sim_j = similarity(xj_old.loc[:,cols].iloc[0].values,
-                       xj_new.loc[:,cols].iloc[0].values)
-    sim_ij = similarity(xi_new.loc[:,cols].iloc[0].values,
-                        xj_new.loc[:,cols].iloc[0].values)
-    
-    if(prev_inf > threshold) or \
-        (sim_i <= threshold and sim_j > threshold) or \
-        (sim_i > threshold and sim_j <= threshold):
-            influence = sim_ij if sim_i > sim_j else -sim_ij
-    
-    return influence
+    influencing = (prev_inf > threshold) | \
+                  ((sim_i <= threshold) & (sim_j > threshold)) | \
+                  ((sim_i > threshold) & (sim_j <= threshold))
+    return np.where(influencing, np.where(sim_i > sim_j, sim_ij, -sim_ij), 0)
 
 
 if __name__ == '__main__':
@@ -64,8 +32,9 @@ if __name__ == '__main__':
     
     print('READY')
     
-    E, X = filereader(fname)
-    ei = sinf.EdgeInfluence(E = E, X = X, computing_influence = participation_influence)
+    E, X = read_hdf(fname)
+    ei = sinf.EdgeInfluence(E = E, X = X, computing_influence = batched_participation_influence,
+                            columns = ['assists','deaths','kills','score'])
                             
     updated_E = ei()
     
@@ -84,3 +53,9 @@ if __name__ == '__main__':
         hdf.put('nodes', influences, format = 'table', data_columns = True)
 
     print(influences)
+
+    #the indexed store answers the top-k and per-node queries without loading the tables
+    store = write_store(os.path.join(tempfile.mkdtemp(), 'toy_influence.store'), edges = updated_E,
+                        nodes = influences)
+    print('STORE WRITTEN TO ' + store.path)
+    print(store.top('nodes', k = 10))
@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 setup(
   name = 'sinfpy',         # How you named your package folder (MyLib)
   packages = ['sinfpy'],   # Chose the same as "name"
@@ -13,10 +13,14 @@ setup(
   install_requires=[
         'numpy',
         'pandas',
-        'ray',
-        'psutil',
         'scipy'
       ],
+  extras_require={
+        'ray': ['ray', 'psutil'],     # executor = 'ray', and the physical cores and worker memory
+        'parquet': ['pyarrow'],       # Parquet and Arrow data (sinfpy.io)
+        'hdf5': ['tables'],           # HDF5 data (sinfpy.io and the example)
+        'all': ['ray', 'psutil', 'pyarrow', 'tables']
+      },
   classifiers=[
     'Development Status :: 3 - Alpha',      # Chose either "3 - Alpha", "4 - Beta" or "5 - Production/Stable" as the current state of your package
     'Programming Language :: Python :: 3',
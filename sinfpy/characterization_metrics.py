@@ -3,63 +3,123 @@
 import numpy as np
 import pandas as pd
 
+from sinfpy import executors as exe
+from sinfpy.encoding import NodeDictionary
+from sinfpy.instrumentation import get_monitor
+
 #Computing the metric retention transfer defined in the paper
-#to evaluate to what extend nodes impact their neighbors 
-#retention in the game. It hase value in (0,+inf). 
+#to evaluate to what extend nodes impact their neighbors
+#retention in the game. It hase value in (0,+inf).
 #The lower the value, the more the node impacted its neighbors.
 #it take as input the selection of nodes for which the retention transfer
 #is needed, the edge list and the data list (?)
-def retention_transfer(nodes_sel, E, X):
-    
-    nodes_sel = nodes_sel.index.tolist()
-    
-    E = E.reset_index()
-    E_filtered = E[[a in nodes_sel or b in nodes_sel for a,b in \
-                    zip(E.p1.tolist(), E.p2.tolist())]]
-    E_filtered = E_filtered.groupby(['p1','p2']).agg({'timeframe':'min'})
-    E_filtered = E_filtered.reset_index()
-    
-    X_filtered = X.groupby('characterId').agg({'timeframe':'max'})
-    selection = list(set(E_filtered.p1.tolist() + E_filtered.p2.tolist()))
-    X_filtered = X_filtered[[a in selection for a in X_filtered.index.tolist()]]
-    X_filtered = X_filtered.reset_index()
-    
-    X_filtered.columns = ['node','end_tf']
-    E_filtered.columns = ['p1','p2','start_tf']
-    
-    res = E_filtered.set_index('p1').join(X_filtered.set_index('node'), how = 'left', lsuffix = '_p1').reset_index()
-    res = res.set_index('p2').join(X_filtered.set_index('node'), how = 'left', lsuffix = '_p2').reset_index()
-    res.columns = ['p1','p2','start','end_p2','end_p1']
-    
-    nodes_sel = pd.DataFrame(columns = ['node'], data = nodes_sel)
-    nodes_sel.loc[:,'how_long_retained'] = -1
-    nodes_sel.loc[:,'how_long_retained'] = -1
-    nodes_sel.loc[:,'how_long_also_drop'] = -1
-    nodes_sel.loc[:,'retention_transfer'] = 1000000
-        
-    
-    for n in nodes_sel.node:
-        rt = []
-        retained = []
-        drop = []
-        for _,row in res.loc[res.p1 == n,:].iterrows():
-            end_n = row.end_p2
-            end_i = row.end_p1
-            start = row.start
-            rt.append(abs((end_n - start + 1) - (end_i - start + 1)))
-            retained.append((end_n - start + 1) / (end_i - start + 1))
-            drop.append(-1 if end_n < end_i else (end_n - end_i + 1))
-        for _,row in res.loc[res.p2 == n,:].iterrows():
-            end_n = row.end_p1
-            end_i = row.end_p2
-            start = row.start
-            rt.append(abs((end_n - start + 1) - (end_i - start + 1)))
-            retained.append((end_n - start + 1) / (end_i - start + 1))
-            drop.append(-1 if end_n < end_i else (end_n - end_i + 1))
-        
-        nodes_sel.loc[nodes_sel.node == n, 'retention_transfer'] = np.mean(rt)
-        nodes_sel.loc[nodes_sel.node == n, 'how_long_retained'] = np.mean(retained)
-        nodes_sel.loc[nodes_sel.node == n, 'how_long_also_drop'] = np.mean(drop)
-        nodes_sel.loc[nodes_sel.node == n, 'n_neighbora'] = len(retained)
-        
-    return nodes_sel
\ No newline at end of file
+#nodes_sel  the selected nodes: a DataFrame (or Series) indexed by the nodes, e.g. the top rows
+#           of the node influence table indexed by node, or a list of nodes.
+#           If None the retention transfer is computed for all the nodes of the edges.
+#The edges of the selected nodes are gathered with array lookups, and the metrics are aggregated
+#by node over the chunks of nodes, which are run by the executor as in EdgeInfluence and NodeInfluence:
+#executor   can either be 'serial', 'threads', 'processes', 'ray', an Executor instance, or 'auto'
+#           (default), which uses serial (or threads if n_workers > 1).
+#monitor    follows the progress of the computation as in EdgeInfluence (see sinfpy.instrumentation),
+#           the throughput of the workers is in selected nodes per second.
+#It returns the table of the selected nodes with their retention transfer, how long they retained
+#and also dropped, and their number of neighbors.
+def retention_transfer(nodes_sel, E, X, user_id = 'characterId', edge_u = 'p1', edge_v = 'p2',
+                       timeframe = 'timeframe', n_workers = None, executor = 'auto', monitor = None):
+    if executor == 'auto':
+        executor = 'threads' if n_workers is not None and n_workers > 1 else 'serial'
+    executor = exe.get_executor(executor, n_workers)
+    monitor = get_monitor(monitor)
+    monitor.start('retention_transfer', 'nodes')
+
+    with monitor.phase('prepare'):
+        ptr, rt, retained, drop, nodes, nodes_sel, sel, sel_nodes = \
+            retention_data(nodes_sel, E, X, user_id, edge_u, edge_v, timeframe)
+        #the cost of a node grows with the number of its edges
+        nindexes, costs = exe.balanced_chunks(np.diff(ptr) + 1, executor.n_workers)
+
+    with monitor.phase('compute'):
+        scores = executor.map(retention_job, (ptr, rt, retained, drop), nindexes, costs, monitor)
+
+    with monitor.phase('collect'):
+        scores = np.concatenate(scores, axis = 1) if len(scores) else np.zeros((4, 0))
+
+        #the results are mapped back on the selection, nodes without edges have no neighbors
+        rows = np.full(len(nodes), -1)
+        rows[sel_nodes] = np.arange(len(sel_nodes))
+        rows = np.where(sel >= 0, rows[np.maximum(sel, 0)], -1)
+        scores = np.c_[scores, [np.nan, np.nan, np.nan, 0]][:,rows]
+
+        retention = pd.DataFrame({'node' : nodes_sel,
+                                  'how_long_retained' : scores[1],
+                                  'how_long_also_drop' : scores[2],
+                                  'retention_transfer' : scores[0],
+                                  'n_neighbora' : scores[3]})
+    monitor.finish()
+    return retention
+
+#Gathers the edges of the selected nodes. It returns the metrics of every (node, neighbor) row,
+#grouped by selected node: the rows of the k-th selected node are the ones in [ptr[k], ptr[k+1]).
+#It also returns the dictionary of the nodes, the selection with its codes, and the codes of the
+#selected nodes in order.
+def retention_data(nodes_sel, E, X, user_id, edge_u, edge_v, timeframe):
+    E = E.reset_index(drop = edge_u in E.columns)
+    nodes = NodeDictionary(E.loc[:,edge_u], E.loc[:,edge_v])
+    u = nodes.encode(E.loc[:,edge_u])
+    v = nodes.encode(E.loc[:,edge_v])
+
+    if nodes_sel is None:
+        nodes_sel = nodes.decode(np.arange(len(nodes)))
+    elif isinstance(nodes_sel, (pd.DataFrame, pd.Series)):
+        nodes_sel = nodes_sel.index.values
+    else:
+        nodes_sel = np.asarray(nodes_sel)
+    sel = nodes.encode(nodes_sel)
+    selected = np.zeros(len(nodes), dtype = bool)
+    selected[sel[sel >= 0]] = True
+
+    #the edges of the selected nodes, with the first timeframe they appear in
+    keep = selected[u] | selected[v]
+    edges = pd.DataFrame({'u' : u[keep], 'v' : v[keep], 'start' : E.loc[:,timeframe].values[keep]})
+    edges = edges.groupby(['u', 'v'], sort = False).agg(start = ('start', 'min')).reset_index()
+
+    #the last timeframe of every node, NaN if the node has no properties
+    last = X.groupby(user_id).agg(end = (timeframe, 'max'))
+    end = np.full(len(nodes), np.nan)
+    codes = nodes.encode(last.index.values)
+    end[codes[codes >= 0]] = last.loc[:,'end'].values[codes >= 0]
+
+    #every edge is seen from both its nodes, self loops included
+    node = np.r_[edges.u.values, edges.v.values]
+    neighbor = np.r_[edges.v.values, edges.u.values]
+    start = np.r_[edges.start.values, edges.start.values]
+    keep = selected[node]
+    node, neighbor, start = node[keep], neighbor[keep], start[keep]
+
+    end_n = end[neighbor]
+    end_i = end[node]
+    rt = np.abs((end_n - start + 1) - (end_i - start + 1))
+    retained = (end_n - start + 1) / (end_i - start + 1)
+    drop = np.where(end_n < end_i, -1, end_n - end_i + 1)
+
+    #the rows of the k-th selected node are the ones in [ptr[k], ptr[k+1])
+    sel_nodes = np.flatnonzero(selected)
+    position = np.searchsorted(sel_nodes, node)
+    order = np.argsort(position, kind = 'stable')
+    ptr = np.r_[0, np.cumsum(np.bincount(position, minlength = len(sel_nodes)))]
+    return ptr, rt[order], retained[order], drop[order], nodes, nodes_sel, sel, sel_nodes
+
+#The job for an individual worker computed on its slice of the selected nodes.
+#It returns the mean retention transfer, how long retained and also dropped, and the number
+#of neighbors of the nodes of the slice, as the rows of an array.
+def retention_job(ptr, rt, retained, drop, nodes_slice_index):
+    first, last = nodes_slice_index[0], nodes_slice_index[1] + 1
+    rows = slice(ptr[first], ptr[last])
+    count = np.diff(ptr[first:last + 1])
+    node = np.repeat(np.arange(last - first), count)
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        return np.array([np.bincount(node, rt[rows], minlength = last - first) / count,
+                         np.bincount(node, retained[rows], minlength = last - first) / count,
+                         np.bincount(node, drop[rows], minlength = last - first) / count,
+                         count.astype(float)])
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+#Version of the format of the checkpoints.
+CHECKPOINT_VERSION = 1
+
+#Checkpoints of the computations of EdgeInfluence, NodeInfluence and SemanticInfluence.
+#The result of every chunk is written to the directory of the checkpoint as soon as it is
+#completed, as a NPZ file, so that a computation stopped before its end (e.g. by a worker
+#running out of memory, or by the node being pre-empted) can be resumed by running it again
+#with the same checkpoint: the completed chunks are read back, and only the missing ones
+#are computed.
+#Every computation has its own subdirectory (e.g. EdgeInfluence), with a manifest holding the
+#fingerprint of its data and parameters and the chunks it is split in. The chunks of the
+#manifest are reused when the computation is resumed, even with a different number of workers.
+#A checkpoint made with different data or parameters raises a ValueError, unless overwrite is
+#True, in which case it is deleted and the computation starts over.
+#The files are kept once the computation is completed, so that running it again only reads
+#them: clear deletes them.
+class Checkpoint:
+    enabled = True
+
+    def __init__(self, directory, overwrite = False):
+        self.directory = str(directory)
+        self.overwrite = overwrite
+
+    #Opens the checkpoint of the computation name, whose data and parameters have the given
+    #fingerprint, split in tasks with their costs. It returns the tasks and costs to run, which
+    #are the ones of the checkpoint if it already exists.
+    def open(self, name, fingerprint, tasks, costs):
+        self.path = os.path.join(self.directory, name)
+        manifest = self.manifest()
+        if manifest is not None and manifest['fingerprint'] != fingerprint:
+            if not self.overwrite:
+                raise ValueError('The checkpoint in ' + self.path + ' was made with different data or parameters.')
+            self.clear(name)
+            manifest = None
+
+        if manifest is None:
+            os.makedirs(self.path, exist_ok = True)
+            manifest = {'version' : CHECKPOINT_VERSION, 'computation' : name, 'fingerprint' : fingerprint,
+                        'tasks' : [list(task) for task in tasks], 'costs' : list(costs)}
+            _write(os.path.join(self.path, 'manifest.json'), json.dumps(manifest, indent = 2).encode())
+        return manifest['tasks'], manifest['costs']
+
+    #Returns the manifest of the opened computation, None if it does not exist yet.
+    def manifest(self):
+        try:
+            with open(os.path.join(self.path, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        if manifest.get('version') != CHECKPOINT_VERSION:
+            raise ValueError('The checkpoint in ' + self.path + ' has an unsupported version.')
+        return manifest
+
+    #Runs fn(*args, task) on the executor for every task not completed yet, saving every result
+    #as soon as it is completed, and returns the results of all the tasks in their order, as
+    #Executor.map. The timings of the executor only hold the tasks run.
+    def map(self, executor, fn, args, tasks, costs = None, monitor = None):
+        costs = [1]*len(tasks) if costs is None else list(costs)
+        results = [self.load(k) for k in range(len(tasks))]
+        missing = [k for k, result in enumerate(results) if result is None]
+
+        runs = executor.map(fn, args, [tasks[k] for k in missing], [costs[k] for k in missing], monitor,
+                            lambda k, result : self.save(missing[k], result))
+        for k, result in zip(missing, runs):
+            results[k] = result
+        for timing in executor.timings:
+            timing['task'] = missing[timing['task']]
+        return results
+
+    def chunk_path(self, k):
+        return os.path.join(self.path, 'chunk-%06d.npz' % k)
+
+    #Writes the result of the k-th task: an array, a tuple of arrays or a DataFrame.
+    def save(self, k, result):
+        if isinstance(result, pd.DataFrame):
+            arrays = {'frame:' + str(c) : result.loc[:,c].values for c in result.columns}
+        elif isinstance(result, tuple):
+            arrays = {'tuple:%d' % n : np.asarray(r) for n, r in enumerate(result)}
+        else:
+            arrays = {'array' : np.asarray(result)}
+        path = self.chunk_path(k)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(path + '.tmp', path)
+
+    #Reads the result of the k-th task, None if it is not completed.
+    def load(self, k):
+        try:
+            with np.load(self.chunk_path(k), allow_pickle = False) as data:
+                arrays = {key : data[key] for key in data.files}
+        except FileNotFoundError:
+            return None
+        if 'array' in arrays:
+            return arrays['array']
+        if all(key.startswith('tuple:') for key in arrays):
+            return tuple(arrays['tuple:%d' % n] for n in range(len(arrays)))
+        return pd.DataFrame({key[len('frame:'):] : a for key, a in arrays.items()})
+
+    #Deletes the checkpoint of the computation name, or of all the computations if name is None.
+    def clear(self, name = None):
+        if name is None and not os.path.isdir(self.directory):
+            return
+        names = os.listdir(self.directory) if name is None else [name]
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(os.path.join(path, 'manifest.json')):
+                continue
+            for file in os.listdir(path):
+                if file == 'manifest.json' or file.startswith('chunk-'):
+                    os.remove(os.path.join(path, file))
+            if len(os.listdir(path)) == 0:
+                os.rmdir(path)
+
+#Checkpoint used when checkpointing is disabled: the tasks are run by the executor as they are.
+class NullCheckpoint(Checkpoint):
+    enabled = False
+
+    def __init__(self):
+        pass
+
+    def open(self, name, fingerprint, tasks, costs):
+        return tasks, costs
+
+    def map(self, executor, fn, args, tasks, costs = None, monitor = None):
+        return executor.map(fn, args, tasks, costs, monitor)
+
+NULL_CHECKPOINT = NullCheckpoint()
+
+#Returns the checkpoint specified by the checkpoint parameter, which can either be a Checkpoint,
+#the path of its directory, or None.
+def get_checkpoint(checkpoint):
+    if checkpoint is None:
+        return NULL_CHECKPOINT
+    if isinstance(checkpoint, Checkpoint):
+        return checkpoint
+    if isinstance(checkpoint, (str, os.PathLike)):
+        return Checkpoint(checkpoint)
+    raise TypeError('checkpoint should be a Checkpoint or the path of a directory.')
+
+#Fingerprint of a computation: a hash of the content of its tables (values, index, columns
+#and types) and of its parameters, given as a dict of values whose repr is stable.
+def fingerprint(tables, params):
+    h = hashlib.sha256()
+    for table in tables:
+        h.update(repr((list(table.columns), list(table.index.names),
+                       [str(t) for t in table.dtypes])).encode())
+        h.update(pd.util.hash_pandas_object(table, index = True).values.tobytes())
+    h.update(repr(sorted(params.items())).encode())
+    return h.hexdigest()
+
+#Name of a function in the fingerprint of the parameters.
+def function_name(fn):
+    fn = getattr(fn, '__func__', fn)
+    return getattr(fn, '__module__', '') + '.' + getattr(fn, '__qualname__', type(fn).__name__)
+
+#Writes data to path atomically, so that an interrupted write leaves no partial file.
+def _write(path, data):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+#Dictionary mapping the external ids of the nodes to dense int32 codes.
+#The ids are encoded once on input, all the internal tables and arrays use the codes,
+#and the external ids are restored only on output.
+#Ids which are not numbers are stored as strings. The ids are ordered by their numeric
+#value whenever they all represent numbers (as done by int(id) on the string ids), otherwise
+#by their strings. The codes of the initial ids follow that order, so that the node with
+#the lowest id also has the lowest code; ids added later by extend get the following codes.
+class NodeDictionary:
+    #ids    one or more arrays (or Series) of node ids.
+    def __init__(self, *ids):
+        values = pd.Index(np.concatenate([np.asarray(x) for x in ids])).unique() if ids else pd.Index([])
+        self.numeric = pd.api.types.is_numeric_dtype(values.dtype)
+        if not self.numeric:
+            values = pd.Index(values.astype(str)).unique()
+        keys = self._keys(values)
+        order = np.argsort(keys, kind = 'stable')
+        self.ids = values[order]
+        self.keys = keys[order]
+
+    #Keys used to order the ids.
+    def _keys(self, values):
+        if self.numeric:
+            return np.asarray(values)
+        keys = pd.to_numeric(pd.Series(np.asarray(values, dtype = object)), errors = 'coerce')
+        return np.asarray(values, dtype = object) if keys.isna().any() else keys.values
+
+    def __len__(self):
+        return len(self.ids)
+
+    #Normalizes the external ids so that they can be looked up in the dictionary.
+    def _normalize(self, values):
+        values = np.asarray(values)
+        if not self.numeric and values.dtype.kind != 'U':
+            values = values.astype(str)
+        return values
+
+    #Returns the int32 codes of the given ids, -1 for ids which are not in the dictionary.
+    def encode(self, values):
+        return self.ids.get_indexer(self._normalize(values)).astype(np.int32)
+
+    #Adds to the dictionary the given ids which are not already in it,
+    #and returns the codes of all the given ids.
+    def extend(self, values):
+        values = self._normalize(values)
+        new = pd.Index(values).unique().difference(self.ids, sort = False)
+        if len(new) > 0:
+            keys = self._keys(new)
+            order = np.argsort(keys, kind = 'stable')
+            self.ids = self.ids.append(new[order])
+            self.keys = np.r_[self.keys, keys[order]]
+        return self.encode(values)
+
+    #Returns the external ids of the given codes.
+    def decode(self, codes):
+        return self.ids.values[np.asarray(codes)]
+
+    #Orders the two ends of every edge, given as codes, so that i is the node with the lowest id.
+    #It returns the arrays of i and j codes.
+    def ordered_ends(self, u, v):
+        u = np.asarray(u)
+        v = np.asarray(v)
+        swap = self.keys[u] > self.keys[v]
+        return np.where(swap, v, u), np.where(swap, u, v)
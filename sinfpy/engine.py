@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+from scipy import sparse
+
+from sinfpy.utils import balance_influence, number_of_peaks
+
+#Number of edge steps whose properties are gathered from the attribute cube at once.
+#It bounds the memory used by the batched similarity computation.
+CHUNK_SIZE = 65536
+
+#Pivots the attributes table X into a dense cube of shape (node, timeframe, attribute).
+#The user_id column of X holds the int codes of the nodes, which are used as rows of the cube,
+#and n_nodes is the number of codes. It returns the sorted array of timeframes, the cube and
+#a boolean matrix of shape (node, timeframe) marking which properties are actually available.
+#If a node has more than one row for the same timeframe the first one is kept.
+def attribute_cube(X, user_id, timeframe, attributes, n_nodes):
+    X = X.drop_duplicates(subset = [user_id, timeframe], keep = 'first')
+    timeframes = np.unique(X.loc[:,timeframe].values.astype(float))
+
+    node_codes = X.loc[:,user_id].values
+    tf_codes = np.searchsorted(timeframes, X.loc[:,timeframe].values.astype(float))
+
+    cube = np.full((n_nodes, len(timeframes), len(attributes)), np.nan)
+    cube[node_codes, tf_codes] = X.loc[:,attributes].values.astype(float)
+    present = np.zeros((n_nodes, len(timeframes)), dtype = bool)
+    present[node_codes, tf_codes] = True
+
+    return timeframes, cube, present
+
+#Maps the timeframes values on the positions of the timeframe axis of the cube.
+#Values which are not on the axis are mapped to -1.
+def timeframe_codes(timeframes, values):
+    values = np.asarray(values, dtype = float)
+    codes = np.searchsorted(timeframes, values)
+    found = codes < len(timeframes)
+    found[found] = timeframes[codes[found]] == values[found]
+    return np.where(found, codes, -1)
+
+#Flattens the rows of the edges table E, indexed by (p1, p2), into arrays sorted by edge and,
+#within the edge, chronologically: the rows of the k-th edge of edge_list are the ones in
+#[ptr[k], ptr[k+1]). It returns ptr, the sorted timeframes and, if weight is given, the weight
+#of the edge at every timeframe; if an edge has more than one row for the same timeframe the
+#weight of the first one is kept.
+def edge_timeframes(E, edge_list, timeframe, weight = None):
+    edge = edge_list.get_indexer(E.index)
+    tf = E.loc[:,timeframe].values
+    order = np.lexsort((tf, edge))
+    edge = edge[order]
+    tf = tf[order]
+    ptr = np.r_[0, np.cumsum(np.bincount(edge, minlength = len(edge_list)))]
+
+    weights = None
+    if weight is not None:
+        same = np.r_[False, (edge[1:] == edge[:-1]) & (tf[1:] == tf[:-1])]
+        first = np.maximum.accumulate(np.where(same, 0, np.arange(len(edge))))
+        weights = E.loc[:,weight].values[order][first]
+    return ptr, tf, weights
+
+#Flattens the rows of the attributes table X into columns sorted by node: the rows of the
+#node with code k are the ones in [ptr[k], ptr[k+1]), in the order of X. The columns are
+#returned as a dict of arrays, the user_id column first, as the tables of the nodes used by
+#the edge jobs.
+def node_columns(X, user_id, n_nodes):
+    node = X.loc[:,user_id].values
+    order = np.argsort(node, kind = 'stable')
+    ptr = np.r_[0, np.cumsum(np.bincount(node, minlength = n_nodes))]
+    columns = [user_id] + [c for c in X.columns if c != user_id]
+    return ptr, {c : X.loc[:,c].values[order] for c in columns}
+
+#Gathers the properties of the given nodes at the given positions of the timeframe axis.
+#It returns the properties, NaN where they are not available, and a boolean array marking
+#the available ones. Nodes or timeframes equal to -1 are not available.
+def node_properties(cube, present, node, tf):
+    found = (node >= 0) & (tf >= 0)
+    found[found] = present[node[found], tf[found]]
+    properties = np.full((len(node), cube.shape[2]), np.nan)
+    properties[found] = cube[node[found], tf[found]]
+    return properties, found
+
+#Norms of the properties of every node at every timeframe, computed once by the kernel.
+#It returns an array of shape (node, timeframe), or an empty array if the kernel does not use norms.
+def cube_norms(cube, kernel):
+    norms = kernel.norms(cube.reshape(cube.shape[0] * cube.shape[1], cube.shape[2]))
+    return np.zeros(0) if norms is None else norms.reshape(cube.shape[:2])
+
+#Computes the similarities sim_i, sim_j, sim_ij for a batch of edge steps.
+#i, j are the rows of the two nodes in the cube, and t_old, t_new the positions of the
+#previous and current timeframes. norms are the norms of the cube computed by cube_norms.
+#Steps for which one of the four properties vectors is not available are marked as not valid.
+def step_similarities(cube, present, norms, i, j, t_old, t_new, kernel):
+    n = len(i)
+    sim_i = np.zeros(n)
+    sim_j = np.zeros(n)
+    sim_ij = np.zeros(n)
+
+    valid = valid_steps(present, i, j, t_old, t_new)
+
+    steps = np.flatnonzero(valid)
+    for start in range(0, len(steps), CHUNK_SIZE):
+        s = steps[start:start + CHUNK_SIZE]
+        xi_old = cube[i[s], t_old[s]]
+        xi_new = cube[i[s], t_new[s]]
+        xj_old = cube[j[s], t_old[s]]
+        xj_new = cube[j[s], t_new[s]]
+        if len(norms):
+            ni_old, ni_new = norms[i[s], t_old[s]], norms[i[s], t_new[s]]
+            nj_old, nj_new = norms[j[s], t_old[s]], norms[j[s], t_new[s]]
+        else:
+            ni_old = ni_new = nj_old = nj_new = None
+        sim_i[s] = kernel(xi_old, xi_new, ni_old, ni_new)
+        sim_j[s] = kernel(xj_old, xj_new, nj_old, nj_new)
+        sim_ij[s] = kernel(xi_new, xj_new, ni_new, nj_new)
+
+    return sim_i, sim_j, sim_ij, valid
+
+#Marks the steps for which the four properties vectors are available.
+def valid_steps(present, i, j, t_old, t_new):
+    valid = (i >= 0) & (j >= 0) & (t_old >= 0) & (t_new >= 0)
+    valid[valid] = present[i[valid], t_old[valid]] & present[i[valid], t_new[valid]] & \
+                   present[j[valid], t_old[valid]] & present[j[valid], t_new[valid]]
+    return valid
+
+#Position of every step within its edge, given the steps sorted by edge.
+def step_positions(step_edge):
+    if len(step_edge) == 0:
+        return np.zeros(0, dtype = np.int64)
+    first = np.r_[True, step_edge[1:] != step_edge[:-1]]
+    starts = np.flatnonzero(first)
+    group = np.cumsum(first) - 1
+    return np.arange(len(step_edge)) - starts[group]
+
+#Sweeps the steps by their position within the edge, given the steps sorted by edge and,
+#within the edge, chronologically. The recurrence is sequential in time, so at every sweep it
+#yields the valid steps having that position, one per edge, which can be updated together.
+def step_sweeps(step_edge, valid):
+    position = step_positions(step_edge)
+    order = np.argsort(position, kind = 'stable')
+    bounds = np.searchsorted(position[order], np.arange(position.max() + 2)) if len(order) else [0]
+
+    for k in range(len(bounds) - 1):
+        s = order[bounds[k]:bounds[k + 1]]
+        yield s[valid[s]]
+
+#Runs the threshold/prev_inf recurrence of properties_similarity for all the edges at once.
+#The steps must be sorted by edge and, within the edge, chronologically, and are swept by
+#their position within the edge.
+#Not valid steps leave the influence of the edge unchanged. initial is the influence of the
+#edges before the first step (0 if None).
+#threshold and penality can also be arrays of the same length P, in which case the recurrence
+#is run for the P pairs of values at once, on the same similarities, and the influence is an
+#array of shape (n_edges, P).
+def influence_recurrence(n_edges, step_edge, sim_i, sim_j, sim_ij, valid, weight,
+                         threshold, balance_inf, penality, initial = None):
+    shape = (n_edges,) + np.shape(threshold)
+    influence = np.zeros(shape) if initial is None else np.array(initial, dtype = float)
+    #the values of the steps are broadcast over the parameters
+    expand = (slice(None),) + (None,) * np.ndim(threshold)
+
+    for s in step_sweeps(step_edge, valid):
+        e = step_edge[s]
+        inf = recurrence_step(influence[e], sim_i[s][expand], sim_j[s][expand], sim_ij[s][expand],
+                              threshold)
+
+        if balance_inf:
+            inf = balance_influence(inf, weight[s][expand], penality)
+
+        influence[e] = inf
+
+    return influence
+
+#One step of the recurrence of properties_similarity for a batch of edges, given their previous
+#influence and the similarities of the step. It returns the new influence of the edges.
+def recurrence_step(prev_inf, sim_i, sim_j, sim_ij, threshold):
+    cond = (prev_inf > threshold) | \
+           ((sim_i <= threshold) & (sim_j > threshold)) | \
+           ((sim_i > threshold) & (sim_j <= threshold))
+    return np.where(cond, np.where(sim_i > sim_j, sim_ij, -sim_ij), 0.0)
+
+#Runs the recurrence of a static network, where every edge has a step between every two
+#consecutive timeframes of the cube, as a dense sweep over the (edge, timeframe) grid: at every
+#timeframe the properties of all the edges are gathered from the cube at once, without building
+#the arrays of steps. The edges are swept in blocks of CHUNK_SIZE, and the weight of every step
+#is the number of timeframes.
+#A node without properties at one of the two timeframes of a step (i.e. not present in the cube)
+#leaves the influence of the edge unchanged at that step, as the not valid steps of the dynamic
+#recurrences. If fn is None the recurrence of properties_similarity is run on the similarities
+#computed by the kernel, otherwise fn is the batched influence function, as in function_recurrence.
+def static_recurrence(cube, present, norms, i, j, fn, kernel, threshold, balance_inf, penality):
+    influence = np.zeros(len(i))
+    n_tf = cube.shape[1]
+
+    for start in range(0, len(i), CHUNK_SIZE):
+        bi = i[start:start + CHUNK_SIZE]
+        bj = j[start:start + CHUNK_SIZE]
+        available = present[bi] & present[bj]
+        block = influence[start:start + CHUNK_SIZE]
+
+        for t in range(n_tf - 1):
+            e = np.flatnonzero(available[:,t] & available[:,t + 1])
+            if len(e) == 0:
+                continue
+            xi_old, xi_new = cube[bi[e], t], cube[bi[e], t + 1]
+            xj_old, xj_new = cube[bj[e], t], cube[bj[e], t + 1]
+
+            if fn is None:
+                if len(norms):
+                    ni_old, ni_new = norms[bi[e], t], norms[bi[e], t + 1]
+                    nj_old, nj_new = norms[bj[e], t], norms[bj[e], t + 1]
+                else:
+                    ni_old = ni_new = nj_old = nj_new = None
+                inf = recurrence_step(block[e], kernel(xi_old, xi_new, ni_old, ni_new),
+                                      kernel(xj_old, xj_new, nj_old, nj_new),
+                                      kernel(xi_new, xj_new, ni_new, nj_new), threshold)
+            else:
+                inf = np.asarray(fn(xi_old, xi_new, xj_old, xj_new, threshold, block[e], kernel),
+                                 dtype = float)
+
+            if balance_inf:
+                inf = balance_influence(inf, np.full(len(e), float(n_tf)), penality)
+
+            block[e] = inf
+
+    return influence
+
+#Runs the recurrence of a batched influence function fn for all the edges at once, as
+#influence_recurrence does for properties_similarity. At every sweep fn receives the properties
+#of the steps, as returned by properties(s) for the array of steps s, together with threshold,
+#the previous influence of the edges and the similarity kernel, and returns their influence.
+def function_recurrence(n_edges, step_edge, valid, properties, weight, fn, kernel,
+                        threshold, balance_inf, penality, initial = None):
+    influence = np.zeros(n_edges) if initial is None else np.array(initial, dtype = float)
+
+    for s in step_sweeps(step_edge, valid):
+        if len(s) == 0:
+            continue
+        e = step_edge[s]
+        xi_old, xi_new, xj_old, xj_new = properties(s)
+        inf = np.asarray(fn(xi_old, xi_new, xj_old, xj_new, threshold, influence[e], kernel),
+                         dtype = float)
+
+        if balance_inf:
+            inf = balance_influence(inf, weight[s], penality)
+
+        influence[e] = inf
+
+    return influence
+
+#Builds the signed node-edge incidence matrix of the edges table, in CSR format.
+#u and v are the positions in nodes of the two ends of every edge. The entry (n, e) is the
+#influence of the edge e if n is its first node, and -influence if n is its second node;
+#self loops only count once, as first node. Within a row the edges keep the order of the table.
+def incidence_matrix(n_nodes, u, v, influence):
+    edge = np.arange(len(u))
+    loop = u == v
+    rows = np.concatenate([u, v[~loop]])
+    cols = np.concatenate([edge, edge[~loop]])
+    data = np.concatenate([influence, -influence[~loop]]).astype(float)
+
+    order = np.lexsort((cols, rows))
+    indptr = np.r_[0, np.cumsum(np.bincount(rows, minlength = n_nodes))]
+    return sparse.csr_matrix((data[order], cols[order], indptr), shape = (n_nodes, len(u)))
+
+#Builds the signed adjacency matrix of the edges table, normalized by the degree of the nodes,
+#in CSR format. u and v are the positions in nodes of the two ends of every edge. The entry
+#(u, v) is the influence of the edge and (v, u) its opposite, summed over the edges between
+#the same nodes, divided by the number of edges of the row node (counted as in the incidence
+#matrix): the product with a vector of ones is the mean influence of every node.
+def signed_adjacency(n_nodes, u, v, influence):
+    loop = u == v
+    rows = np.concatenate([u, v[~loop]])
+    cols = np.concatenate([v, u[~loop]])
+    data = np.concatenate([influence, -influence[~loop]]).astype(float)
+
+    degree = np.bincount(rows, minlength = n_nodes).astype(float)
+    A = sparse.csr_matrix((data / degree[rows], (rows, cols)), shape = (n_nodes, n_nodes))
+    A.sum_duplicates()
+    return A
+
+#Folds the influence of a batch of edges into the aggregates of their nodes, as the rows of the
+#incidence matrix: u gets the influence of the edge, v its opposite, and self loops count once.
+#It returns the nodes of the batch and, as rows of an array, the sum and number of the signed
+#influences of their edges in the batch.
+def node_partials(u, v, influence):
+    loop = u == v
+    nodes = np.concatenate([u, v[~loop]])
+    signed = np.concatenate([influence, -influence[~loop]]).astype(float)
+    index, inverse = np.unique(nodes, return_inverse = True)
+    return index, np.array([np.bincount(inverse, signed, minlength = len(index)),
+                            np.bincount(inverse, minlength = len(index)).astype(float)])
+
+#Aggregates the incidence matrix by node. It returns the mean influence and the number of
+#edges of every node and, if stats is True, the standard deviation and the number of peaks
+#of the influence over the node's edges (otherwise None).
+def incidence_aggregates(M, stats = False):
+    #the matrix-vector product sums every row sequentially, as done edge by edge
+    ones = np.ones(M.shape[1])
+    count = np.diff(M.indptr)
+    influence = M.dot(ones) / count
+
+    std = None
+    n_peaks = None
+    if stats:
+        rows = np.repeat(np.arange(M.shape[0]), count)
+        deviation = M.data - influence[rows]
+        squares = sparse.csr_matrix((deviation * deviation, M.indices, M.indptr), shape = M.shape)
+        std = np.sqrt(squares.dot(ones) / count)
+        n_peaks = incidence_peaks(M, range(M.shape[0]))
+
+    return influence, count, std, n_peaks
+
+#Number of peaks of the influence over the edges of the given rows of the incidence matrix.
+def incidence_peaks(M, rows):
+    return np.array([number_of_peaks(M.data[M.indptr[k]:M.indptr[k + 1]]) for k in rows],
+                    dtype = np.int64)
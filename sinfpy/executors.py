@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from sinfpy.instrumentation import get_monitor, NULL_MONITOR
+
+#Number of chunks created for every worker. The chunks are pulled dynamically by the
+#workers as soon as they are idle, so that costly chunks do not leave the others waiting.
+CHUNKS_PER_WORKER = 8
+
+#Executors run the jobs of EdgeInfluence and NodeInfluence on the chunks of the data.
+#A job is a function fn(*args, task): args are the (possibly large) data shared by all
+#the jobs, task is the chunk of the data the job works on.
+#Executors are context managers: the resources (e.g. the Ray cluster) are acquired when
+#the outermost with block is entered and released when it is exited, so the same executor
+#can be shared by more than one computation.
+#After every map, timings holds, for every task, the worker that ran it, its estimated
+#cost, the seconds it took and the memory of the worker after running it.
+#A monitor (see sinfpy.instrumentation) can follow the progress of map: it is notified as
+#soon as every task is completed, and times the sharing of args with the workers.
+class Executor:
+    def __init__(self, n_workers = None):
+        self.n_workers = default_workers() if n_workers is None else n_workers
+        self.depth = 0
+        self.timings = []
+
+    def __enter__(self):
+        if self.depth == 0:
+            self.start()
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            self.stop()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    #Runs fn(*args, task) for every task, and returns the results in the order of tasks.
+    #If the costs of the tasks are given, the most costly tasks are scheduled first.
+    #If on_result is not None, on_result(k, result) is called as soon as the k-th task is
+    #completed, e.g. to save its result.
+    def map(self, fn, args, tasks, costs = None, monitor = None, on_result = None):
+        costs = [1]*len(tasks) if costs is None else list(costs)
+        order = sorted(range(len(tasks)), key = lambda k: -costs[k])
+
+        monitor = get_monitor(monitor)
+        monitor.chunks(tasks, costs)
+        done = None
+        if monitor.enabled or on_result is not None:
+            def done(k, run):
+                if on_result is not None:
+                    on_result(order[k], run[0])
+                monitor.chunk_done(tasks[order[k]], costs[order[k]], run[1], run[2])
+
+        with self:
+            runs = self.run(fn, args, [tasks[k] for k in order], done, monitor)
+
+        results = [None]*len(tasks)
+        self.timings = []
+        for k, (result, worker, seconds, memory) in zip(order, runs):
+            results[k] = result
+            self.timings.append({'worker': worker, 'task': k, 'cost': costs[k], 'seconds': seconds,
+                                 'memory': memory})
+        return results
+
+    #Runs run_job(fn, *args, task) for every task, in the order of tasks, and returns the runs
+    #in the same order. If done is not None, done(k, run) is called as soon as the k-th task is
+    #completed. The copy of args for the workers, if any, is timed as the share phase of monitor.
+    def run(self, fn, args, tasks, done = None, monitor = NULL_MONITOR):
+        raise NotImplementedError
+
+#Runs the jobs one after the other in the calling process.
+class SerialExecutor(Executor):
+    def __init__(self, n_workers = None):
+        super().__init__(1)
+
+    def run(self, fn, args, tasks, done = None, monitor = NULL_MONITOR):
+        runs = []
+        for k, task in enumerate(tasks):
+            runs.append(run_job(fn, *args, task))
+            if done is not None:
+                done(k, runs[-1])
+        return runs
+
+#Runs the jobs on a pool of threads. The data is shared without any copy, and the
+#batched numpy operations release the GIL.
+class ThreadExecutor(Executor):
+    def run(self, fn, args, tasks, done = None, monitor = NULL_MONITOR):
+        with ThreadPoolExecutor(max_workers = self.n_workers) as pool:
+            futures = [pool.submit(run_job, fn, *args, task) for task in tasks]
+            return _collect(futures, done)
+
+#Runs the jobs on a pool of processes. The numpy arrays in args, also within dicts, are
+#copied once into shared memory blocks, which the workers attach to without copying; the
+#other args are sent once to every worker when the pool starts. fn must be picklable.
+class ProcessExecutor(Executor):
+    def run(self, fn, args, tasks, done = None, monitor = NULL_MONITOR):
+        blocks = []
+        try:
+            with monitor.phase('share') as info:
+                shared_args = [_share(a, blocks) for a in args]
+                info['shared_bytes'] = sum(block.size for block in blocks)
+
+            with ProcessPoolExecutor(max_workers = self.n_workers, initializer = _attach_worker,
+                                     initargs = (fn, shared_args)) as pool:
+                return _collect([pool.submit(_run_worker, task) for task in tasks], done)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+#Runs the jobs on a Ray cluster. If Ray is already initialized the executor attaches to
+#the running cluster and leaves it running, otherwise a local cluster is started and
+#shut down at the end. The args are put once in the object store, from which the workers
+#read the numpy arrays without copying.
+class RayExecutor(Executor):
+    def start(self):
+        import ray
+        self.started = not ray.is_initialized()
+        if self.started:
+            import psutil
+            available = psutil.virtual_memory()[1]
+            ray.init(num_cpus = self.n_workers, object_store_memory = int(available*0.4))
+
+    def stop(self):
+        import ray
+        if self.started:
+            ray.shutdown()
+
+    def run(self, fn, args, tasks, done = None, monitor = NULL_MONITOR):
+        import ray
+        remote_job = ray.remote(run_job)
+        with monitor.phase('share') as info:
+            args_id = [ray.put(a) for a in args]
+            info['shared_bytes'] = sum(_array_bytes(a) for a in args)
+        runs_id = [remote_job.remote(fn, *args_id, task) for task in tasks]
+        if done is None:
+            return ray.get(runs_id)
+
+        position = {run_id : k for k, run_id in enumerate(runs_id)}
+        runs = [None]*len(tasks)
+        pending = runs_id
+        while pending:
+            ready, pending = ray.wait(pending)
+            for run_id in ready:
+                k = position[run_id]
+                runs[k] = ray.get(run_id)
+                done(k, runs[k])
+        return runs
+
+EXECUTORS = {'serial' : SerialExecutor,
+             'threads' : ThreadExecutor,
+             'processes' : ProcessExecutor,
+             'ray' : RayExecutor}
+
+#Number of physical cores, used as default number of workers, or of logical cores if psutil
+#is not installed.
+def default_workers():
+    try:
+        import psutil
+    except ImportError:
+        return os.cpu_count() or 1
+    return psutil.cpu_count(logical = False) or os.cpu_count() or 1
+
+#Returns the executor specified by the executor parameter, which can either be
+#the name of a built-in backend (serial, threads, processes, ray) or an Executor instance.
+def get_executor(executor, n_workers = None):
+    if isinstance(executor, Executor):
+        return executor
+    if not executor in EXECUTORS:
+        raise ValueError('Illegal value for executor, no definition for ' + str(executor))
+    return EXECUTORS[executor](n_workers)
+
+#Runs a job, and returns its result together with the name of the worker, the seconds it took
+#and the memory of the worker afterwards.
+def run_job(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    worker = str(os.getpid()) + '/' + threading.current_thread().name
+    return result, worker, seconds, worker_memory()
+
+#Memory used by the current process, in bytes: its unique set size, i.e. the memory which is not
+#shared with other processes (the shared memory blocks are not counted), or its resident set size
+#if the former is not available. It is None if psutil is not installed.
+def worker_memory():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    process = psutil.Process()
+    try:
+        return process.memory_full_info().uss
+    except (psutil.AccessDenied, AttributeError):
+        return process.memory_info().rss
+
+#Splits the items into contiguous chunks [start, end], ends included, of roughly the same
+#total cost. cost is the estimated cost of every item (e.g. the number of timeframes of
+#an edge); n_workers*CHUNKS_PER_WORKER chunks are created, as long as there are enough items,
+#otherwise every item is a chunk. The items costing more than a chunk are chunks of their own.
+#It returns the chunks and their costs.
+def balanced_chunks(cost, n_workers):
+    cost = np.asarray(cost, dtype = float)
+    if len(cost) == 0:
+        return [], []
+
+    n_chunks = max(1, n_workers*CHUNKS_PER_WORKER)
+    if len(cost) <= n_chunks:
+        return [[k, k] for k in range(len(cost))], [float(c) for c in cost]
+    cumulative = np.cumsum(cost)
+    targets = cumulative[-1] * np.arange(1, n_chunks) / n_chunks
+    #the items costing more than a chunk are chunks of their own
+    heavy = np.flatnonzero(cost > cumulative[-1] / n_chunks)
+    ends = np.unique(np.r_[np.searchsorted(cumulative, targets), heavy[heavy > 0] - 1, heavy, len(cost) - 1])
+    starts = np.r_[0, ends[:-1] + 1]
+
+    chunks = [[int(s), int(e)] for s, e in zip(starts, ends)]
+    costs = [float(c) for c in np.diff(np.r_[0, cumulative[ends]])]
+    return chunks, costs
+
+#Summarizes the timings of an executor by worker: number of chunks, total estimated cost,
+#busy seconds and peak memory in bytes. It is used to check how well the work is balanced
+#among the workers, and how much memory every worker needs.
+def workers_report(timings):
+    report = pd.DataFrame(timings, columns = ['worker', 'task', 'cost', 'seconds', 'memory'])
+    report = report.groupby('worker').agg(chunks = ('task', 'count'),
+                                          cost = ('cost', 'sum'),
+                                          seconds = ('seconds', 'sum'),
+                                          memory = ('memory', 'max'))
+    return report.reset_index()
+
+#Waits for the futures of the runs, calling done(k, run) as soon as the k-th is completed,
+#and returns the runs in the order of the futures.
+def _collect(futures, done):
+    if done is not None:
+        position = {future : k for k, future in enumerate(futures)}
+        for future in as_completed(futures):
+            done(position[future], future.result())
+    return [future.result() for future in futures]
+
+#Bytes of the numpy arrays of an arg, also within a dict.
+def _array_bytes(a):
+    if isinstance(a, np.ndarray):
+        return a.nbytes
+    if isinstance(a, dict):
+        return sum(_array_bytes(x) for x in a.values())
+    return 0
+
+#State of a process worker: the job and its args, attached to the shared memory blocks.
+_worker_fn = None
+_worker_args = None
+_worker_blocks = None
+
+#Copies the numpy arrays of an arg, also within a dict, into shared memory blocks, and
+#returns the description used by the workers to attach to them.
+def _share(a, blocks):
+    if isinstance(a, np.ndarray) and a.dtype != object and a.nbytes > 0:
+        block = shared_memory.SharedMemory(create = True, size = a.nbytes)
+        np.ndarray(a.shape, dtype = a.dtype, buffer = block.buf)[...] = a
+        blocks.append(block)
+        return ('shared', block.name, a.shape, a.dtype.str)
+    if isinstance(a, dict):
+        return ('dict', {k : _share(x, blocks) for k, x in a.items()})
+    return ('object', a)
+
+#Rebuilds an arg in a worker, attaching its arrays to the shared memory blocks.
+def _attach(a):
+    if a[0] == 'shared':
+        block = shared_memory.SharedMemory(name = a[1])
+        _worker_blocks.append(block)
+        return np.ndarray(a[2], dtype = np.dtype(a[3]), buffer = block.buf)
+    if a[0] == 'dict':
+        return {k : _attach(x) for k, x in a[1].items()}
+    return a[1]
+
+def _attach_worker(fn, shared_args):
+    global _worker_fn, _worker_args, _worker_blocks
+    _worker_fn = fn
+    _worker_blocks = []
+    _worker_args = [_attach(a) for a in shared_args]
+
+def _run_worker(task):
+    return run_job(_worker_fn, *_worker_args, task)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+
+#Instrumentation of the computations of EdgeInfluence, NodeInfluence and retention_transfer.
+#A Monitor reports the progress of a computation to a callback, as a sequence of events, which
+#are dicts with the name of the event and of the computation:
+#'phase'    at the end of every phase (e.g. prepare, share, compute, collect), with its wall time
+#           in seconds, the memory of the process and the bytes shared with the workers, if any.
+#'chunk'    every time a chunk is completed, with the number of chunks done and their total, the
+#           worker that ran it, the items (edges or nodes) of the chunk, the throughput of the
+#           worker in items per second, and the estimated seconds remaining.
+#'end'      at the end of the computation, with its total time and the time of every phase.
+#The computations accept a monitor parameter, which can either be a Monitor, a function
+#receiving the events, or None (default) to disable the instrumentation, in which case only
+#a few no-op calls are made per computation.
+class Monitor:
+    enabled = True
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, event, **info):
+        info = dict(event = event, computation = self.computation, **info)
+        self.callback(info)
+
+    #Starts the computation name, whose items are counted in unit (e.g. 'edges').
+    def start(self, name, unit = 'items'):
+        self.computation = name
+        self.unit = unit
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    def finish(self):
+        self.emit('end', seconds = time.perf_counter() - self.started, phases = dict(self.phases))
+
+    #Context manager timing a phase of the computation. info is added to the event.
+    @contextmanager
+    def phase(self, name, **info):
+        start = time.perf_counter()
+        yield info
+        seconds = time.perf_counter() - start
+        self.phases[name] = self.phases.get(name, 0) + seconds
+        self.emit('phase', phase = name, seconds = seconds, memory = process_memory(), **info)
+
+    #Sets the chunks of the computation, with their costs, before they are run.
+    def chunks(self, tasks, costs):
+        self.total = len(tasks)
+        self.done = 0
+        self.cost_total = float(sum(costs))
+        self.cost_done = 0.0
+        self.chunks_started = time.perf_counter()
+        self.workers = {}
+
+    #Called every time a chunk is completed by a worker.
+    def chunk_done(self, task, cost, worker, seconds):
+        self.done += 1
+        self.cost_done += cost
+        items = task[1] - task[0] + 1 if isinstance(task, (list, tuple)) and len(task) == 2 else 1
+
+        stats = self.workers.setdefault(worker, {'items' : 0, 'seconds' : 0.0})
+        stats['items'] += items
+        stats['seconds'] += seconds
+
+        elapsed = time.perf_counter() - self.chunks_started
+        remaining = elapsed * (self.cost_total - self.cost_done) / self.cost_done if self.cost_done > 0 else None
+        self.emit('chunk', done = self.done, total = self.total, worker = worker, items = items,
+                  unit = self.unit, seconds = seconds,
+                  throughput = stats['items'] / stats['seconds'] if stats['seconds'] > 0 else None,
+                  elapsed = elapsed, remaining = remaining)
+
+#Monitor used when the instrumentation is disabled: all its methods do nothing.
+class NullMonitor(Monitor):
+    enabled = False
+
+    def __init__(self):
+        pass
+
+    def emit(self, event, **info):
+        pass
+
+    def start(self, name, unit = 'items'):
+        pass
+
+    def finish(self):
+        pass
+
+    def phase(self, name, **info):
+        return nullcontext(info)
+
+    def chunks(self, tasks, costs):
+        pass
+
+    def chunk_done(self, task, cost, worker, seconds):
+        pass
+
+NULL_MONITOR = NullMonitor()
+
+#Returns the monitor specified by the monitor parameter, which can either be a Monitor,
+#a function receiving the events, or None.
+def get_monitor(monitor):
+    if monitor is None:
+        return NULL_MONITOR
+    if isinstance(monitor, Monitor):
+        return monitor
+    if callable(monitor):
+        return Monitor(monitor)
+    raise TypeError('monitor should be a Monitor or a function.')
+
+#Memory of the current process (resident set size) in bytes, None if psutil is not installed.
+def process_memory():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+#Returns a callback writing the events to a logger (by default the one of sinfpy) with the
+#given level, e.g. monitor = log_events() to follow a long computation.
+def log_events(logger = None, level = logging.INFO):
+    logger = logging.getLogger('sinfpy') if logger is None else logger
+
+    def callback(event):
+        if event['event'] == 'chunk':
+            remaining = event['remaining']
+            logger.log(level, '%s: %d/%d chunks, worker %s at %.0f %s/s, %s s remaining',
+                       event['computation'], event['done'], event['total'], event['worker'],
+                       event['throughput'] or 0, event['unit'],
+                       'unknown' if remaining is None else '%.1f' % remaining)
+        elif event['event'] == 'phase':
+            logger.log(level, '%s: %s took %.3f s, memory %s bytes%s', event['computation'],
+                       event['phase'], event['seconds'], event['memory'],
+                       ', shared %d bytes' % event['shared_bytes'] if 'shared_bytes' in event else '')
+        else:
+            logger.log(level, '%s: done in %.3f s', event['computation'], event['seconds'])
+    return callback
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import re
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+from sinfpy.semantic_influence import EdgeInfluence, NodeInfluence
+
+#Lists the timeframes stored in a pandas HDFStore, where the edges and the properties of
+#every timeframe N are stored under the keys <edges_prefix>N and <data_prefix>N
+#(e.g. edgelist_tf1 and X_tf1). It returns the list of (N, edges key, data key),
+#chronologically ordered; the data key is None if the properties of N are not stored.
+def hdf_timeframes(hdf, edges_prefix = 'edgelist_tf', data_prefix = 'X_tf'):
+    keys = [k.lstrip('/') for k in hdf.keys()]
+    edges = {}
+    data = {}
+    for k in keys:
+        m = re.fullmatch(re.escape(edges_prefix) + r'(\d+)', k)
+        if m:
+            edges[int(m.group(1))] = k
+        m = re.fullmatch(re.escape(data_prefix) + r'(\d+)', k)
+        if m:
+            data[int(m.group(1))] = k
+    return [(tf, edges[tf], data.get(tf)) for tf in sorted(edges)]
+
+#Reads the edges table of a timeframe, with the nodes of the edges as columns.
+def _read_edges(hdf, key, edge_u):
+    E = hdf[key]
+    return E if edge_u in E.columns else E.reset_index()
+
+#Streams the timeframes of the HDFStore in chronological order, one at a time.
+#It yields (timeframe, E, X) with the edges and the properties of the timeframe, so that
+#only one timeframe is in memory at once.
+def read_hdf_timeframes(filename, edges_prefix = 'edgelist_tf', data_prefix = 'X_tf', edge_u = 'p1'):
+    with pd.HDFStore(filename, mode = 'r') as hdf:
+        for tf, edges_key, data_key in hdf_timeframes(hdf, edges_prefix, data_prefix):
+            E = _read_edges(hdf, edges_key, edge_u)
+            X = hdf[data_key] if data_key is not None else None
+            yield tf, E, X
+
+#Reads all the timeframes of the HDFStore at once, and returns the edges table E
+#and the properties table X, as expected by EdgeInfluence.
+def read_hdf(filename, edges_prefix = 'edgelist_tf', data_prefix = 'X_tf', edge_u = 'p1', edge_v = 'p2'):
+    E = []
+    X = []
+    for _, E_tf, X_tf in read_hdf_timeframes(filename, edges_prefix, data_prefix, edge_u):
+        E.append(E_tf)
+        if X_tf is not None:
+            X.append(X_tf)
+    if len(E) == 0 or len(X) == 0:
+        raise ValueError('No timeframes found in ' + filename + '.')
+
+    E = pd.concat(E, ignore_index = True)
+    E = E.sort_values([edge_u, edge_v], kind = 'stable', ignore_index = True)
+    return E, pd.concat(X, ignore_index = True)
+
+#Computes the edge and node influence streaming the timeframes of the HDFStore filename,
+#in chronological order. The first timeframe is computed by EdgeInfluence, and every following
+#one is folded into the result by EdgeInfluence.update and NodeInfluence.update, so that the
+#memory used is bounded by the data of about two timeframes, plus the state of the edges.
+#The influence of the edges active in every timeframe is appended to the table edges_key of
+#fout (by default the same store), with the timeframe column, and the final node influence is
+#written to the table nodes_key.
+#kwargs are passed to EdgeInfluence, which must use the vectorized engine on a dynamic network.
+#It returns the final table of edges and the table of node influence scores.
+def stream_influence(filename, fout = None, stats = False, edges_key = 'edges', nodes_key = 'nodes',
+                     edges_prefix = 'edgelist_tf', data_prefix = 'X_tf', **kwargs):
+    fout = filename if fout is None else fout
+    edge_u = kwargs.get('edge_u', 'p1')
+    edge_v = kwargs.get('edge_v', 'p2')
+
+    with pd.HDFStore(filename, mode = 'a' if fout == filename else 'r') as hdf, \
+         pd.HDFStore(fout, mode = 'a') if fout != filename else nullcontext(hdf) as out:
+        for key in [edges_key, nodes_key]:
+            if key in out:
+                out.remove(key)
+
+        frames = ((tf, _read_edges(hdf, edges_key_tf, edge_u),
+                   hdf[data_key_tf] if data_key_tf is not None else None)
+                  for tf, edges_key_tf, data_key_tf in hdf_timeframes(hdf, edges_prefix, data_prefix))
+        updated_E = None
+        for _, edges_tf, updated_E, influences in influence_timeframes(frames, stats, **kwargs):
+            out.append(edges_key, edges_tf, format = 'table', data_columns = True,
+                       min_itemsize = {edge_u : 32, edge_v : 32})
+
+        if updated_E is None:
+            raise ValueError('No timeframes found in ' + filename + '.')
+        out.put(nodes_key, influences, format = 'table', data_columns = True)
+
+    return updated_E, influences
+
+#Computes the edge and node influence over the timeframes (tf, E, X) of frames, in chronological
+#order, as described in stream_influence; X is None if the properties of tf are not available.
+#For every timeframe it yields tf, the influence of the edges active in tf (with the timeframe
+#column), the updated table of edges and the table of node influence scores.
+def influence_timeframes(frames, stats = False, **kwargs):
+    edge_u = kwargs.get('edge_u', 'p1')
+    edge_v = kwargs.get('edge_v', 'p2')
+    timeframe = kwargs.get('timeframe', 'timeframe')
+
+    ei = None
+    ni = None
+    for tf, E_tf, X_tf in frames:
+        if X_tf is None:
+            X_tf = pd.DataFrame(columns = ei.X.columns if ei is not None else [])
+
+        if ei is None:
+            ei = EdgeInfluence(E_tf, X_tf, **kwargs)
+            updated_E = ei()
+            ni = NodeInfluence(updated_E, edge_u = edge_u, edge_v = edge_v, stats = stats)
+            influences = ni()
+        else:
+            updated_E = ei.update(E_tf, X_tf)
+            influences = ni.update(updated_E)
+
+        active = pd.MultiIndex.from_arrays([E_tf.loc[:,edge_u].values,
+                                            E_tf.loc[:,edge_v].values]).unique()
+        edges_tf = updated_E.set_index([edge_u, edge_v]).loc[active].reset_index()
+        edges_tf.loc[:,timeframe] = tf
+        yield tf, edges_tf, updated_E, influences
+
+#Parquet and Arrow datasets need pyarrow, which is imported only when they are used.
+#A source can either be the path of a Parquet file, of a directory of Parquet files (possibly
+#partitioned by timeframe, as written by write_parquet), a list of paths, or an Arrow Table or
+#Dataset. Only the needed columns are read, and the filters on the timeframes and on the nodes
+#are pushed down to the dataset, so that the row groups and partitions out of the filters are
+#not read at all.
+
+#Minimum number of rows of the row groups written by write_parquet.
+ROWS_PER_GROUP = 131072
+
+#Opens the source as an Arrow dataset. Directories partitioned as timeframe=N are read with
+#the timeframe as a column, as a number.
+def _dataset(source, timeframe):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    if isinstance(source, ds.Dataset):
+        return source
+    if isinstance(source, (pa.Table, pa.RecordBatch)):
+        return ds.dataset(source)
+
+    dataset = ds.dataset(source, format = 'parquet', partitioning = 'hive')
+    if timeframe in dataset.schema.names and pa.types.is_string(dataset.schema.field(timeframe).type):
+        #partitions of timeframes which are not integers are not recognized as numbers
+        partitioning = ds.partitioning(pa.schema([(timeframe, pa.float64())]), flavor = 'hive')
+        dataset = ds.dataset(source, format = 'parquet', partitioning = partitioning)
+    return dataset
+
+#Builds the filter of the rows of a dataset having the timeframe in the range timeframes,
+#given as (first, last), ends included (None for no bound), and all the node columns in nodes.
+def _filter(dataset, timeframe, timeframes, node_columns, nodes):
+    import pyarrow.dataset as ds
+    conditions = []
+    if timeframes is not None and timeframe in dataset.schema.names:
+        first, last = timeframes
+        if first is not None:
+            conditions.append(ds.field(timeframe) >= first)
+        if last is not None:
+            conditions.append(ds.field(timeframe) <= last)
+    if nodes is not None:
+        nodes = list(pd.unique(np.asarray(nodes)))
+        conditions += [ds.field(c).isin(nodes) for c in node_columns]
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+    return condition
+
+#Reads the edges table E and the properties table X from Parquet or Arrow sources, as expected
+#by EdgeInfluence. edges and data are the sources of E and X.
+#columns    the properties of X to read (e.g. the ones needed by computing_influence), besides
+#           user_id and timeframe. If None all the columns are read.
+#timeframes the range (first, last) of timeframes to read, ends included (None for no bound).
+#nodes      if given, only the properties of these nodes and the edges among them are read.
+#Only the columns edge_u, edge_v, timeframe and weight of the edges are read, when available.
+#The edges are sorted by node and, within the edge, chronologically, and the properties
+#chronologically, as returned by read_hdf.
+def read_parquet(edges, data, columns = None, timeframes = None, nodes = None, user_id = 'characterId',
+                 edge_u = 'p1', edge_v = 'p2', timeframe = 'timeframe', weight = 'weight'):
+    edges = _dataset(edges, timeframe)
+    data = _dataset(data, timeframe)
+    for c in [user_id, timeframe] + ([] if columns is None else list(columns)):
+        if not c in data.schema.names:
+            raise ValueError('No ' + c + ' in the columns of data.')
+    for c in [edge_u, edge_v]:
+        if not c in edges.schema.names:
+            raise ValueError('No ' + c + ' in the columns of edges.')
+
+    edge_columns = [c for c in [edge_u, edge_v, timeframe, weight] if c in edges.schema.names]
+    E = edges.to_table(columns = edge_columns,
+                       filter = _filter(edges, timeframe, timeframes, [edge_u, edge_v], nodes)).to_pandas()
+    data_columns = None if columns is None else [user_id, timeframe] + [c for c in columns
+                                                                       if not c in [user_id, timeframe]]
+    X = data.to_table(columns = data_columns,
+                      filter = _filter(data, timeframe, timeframes, [user_id], nodes)).to_pandas()
+
+    #the partitions are not read in chronological order
+    E = E.sort_values([edge_u, edge_v] + ([timeframe] if timeframe in E.columns else []),
+                      kind = 'stable', ignore_index = True)
+    if not X.loc[:,timeframe].is_monotonic_increasing:
+        X = X.sort_values(timeframe, kind = 'stable', ignore_index = True)
+    return E, X
+
+#Lists the timeframes of the edges of a Parquet or Arrow source within the range timeframes,
+#reading only the timeframe column. It returns them sorted.
+def parquet_timeframes(edges, timeframes = None, timeframe = 'timeframe'):
+    edges = _dataset(edges, timeframe)
+    values = edges.to_table(columns = [timeframe],
+                            filter = _filter(edges, timeframe, timeframes, [], None)).column(timeframe)
+    return np.unique(values.to_numpy())
+
+#Streams the timeframes of the Parquet or Arrow sources in chronological order, one at a time,
+#as read_hdf_timeframes. Every timeframe is read with its own filter, so that only its
+#partitions (or row groups) are read. columns, timeframes and nodes are as in read_parquet.
+#It yields (timeframe, E, X) with the edges and the properties of the timeframe.
+def read_parquet_timeframes(edges, data, columns = None, timeframes = None, nodes = None,
+                            user_id = 'characterId', edge_u = 'p1', edge_v = 'p2',
+                            timeframe = 'timeframe', weight = 'weight'):
+    edges = _dataset(edges, timeframe)
+    data = _dataset(data, timeframe)
+    for tf in parquet_timeframes(edges, timeframes, timeframe):
+        yield (tf,) + read_parquet(edges, data, columns, (tf, tf), nodes, user_id, edge_u, edge_v,
+                                   timeframe, weight)
+
+#Writes the table df as a Parquet dataset in the directory path, partitioned by timeframe
+#(a directory timeframe=N for every timeframe N) if df has the timeframe column, otherwise
+#as a single file. The partitions of the timeframes in df are replaced, the others are kept,
+#so that a dataset can be written one timeframe at a time. The rows are written in row groups
+#of at least ROWS_PER_GROUP rows (if available), since many small row groups are slow to read.
+def write_parquet(df, path, timeframe = 'timeframe'):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    table = pa.Table.from_pandas(df, preserve_index = False)
+    partitioning = [timeframe] if timeframe in df.columns else None
+    ds.write_dataset(table, path, format = 'parquet', partitioning = partitioning,
+                     partitioning_flavor = 'hive' if partitioning else None,
+                     basename_template = 'part-{i}.parquet', existing_data_behavior = 'delete_matching',
+                     min_rows_per_group = ROWS_PER_GROUP, max_rows_per_group = 8 * ROWS_PER_GROUP)
+
+#Computes the edge and node influence streaming the timeframes of Parquet or Arrow sources,
+#as stream_influence does for a HDFStore. columns, timeframes and nodes select the data to read
+#as in read_parquet. The influence of the edges active in every timeframe is written to the
+#dataset <output>/edges, partitioned by timeframe, and the final node influence to <output>/nodes.
+#kwargs are passed to EdgeInfluence, which must use the vectorized engine on a dynamic network.
+#It returns the final table of edges and the table of node influence scores.
+def stream_parquet_influence(edges, data, output, stats = False, columns = None, timeframes = None,
+                             nodes = None, **kwargs):
+    names = {k : kwargs[k] for k in ['user_id', 'edge_u', 'edge_v', 'timeframe'] if k in kwargs}
+    timeframe = kwargs.get('timeframe', 'timeframe')
+
+    frames = read_parquet_timeframes(edges, data, columns, timeframes, nodes, **names)
+    updated_E = None
+    for _, edges_tf, updated_E, influences in influence_timeframes(frames, stats, **kwargs):
+        write_parquet(edges_tf, os.path.join(output, 'edges'), timeframe)
+
+    if updated_E is None:
+        raise ValueError('No timeframes found in ' + str(edges) + '.')
+    write_parquet(influences, os.path.join(output, 'nodes'), timeframe)
+    return updated_E, influences
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from sinfpy import engine as eng
+from sinfpy import executors as exe
+from sinfpy.encoding import NodeDictionary
+from sinfpy.instrumentation import get_monitor
+
+#Number of iterations over which the change of the scores is compared: the iterations are
+#considered diverging, and stopped, when the change is larger than that many iterations before.
+DIVERGING_ITERATIONS = 10
+
+class InfluencePropagation:
+    #Initialization of the algorithm to compute how far the influence of the nodes spreads,
+    #through the neighbors of their neighbors, over the edge influence graph.
+    #The updated table of edges E is the signed adjacency matrix P of the nodes (as codes), where
+    #P[u,v] is the influence of the edge (u,v) and P[v,u] its opposite, divided by the number of
+    #edges of the row node, so that P·1 is the node influence score computed by NodeInfluence.
+    #The propagated influence of the nodes is the damped sum over the walks of 1, 2, ... hops
+    #    x = P·1 + damping·P²·1 + damping²·P³·1 + ...
+    #i.e. the Katz centrality of the signed graph, solution of x = P·1 + damping·P·x, which is
+    #computed by iterating the sparse matrix-vector product: no dense matrix is ever formed.
+    #E          is the table of updated edges, with the edge influence
+    #damping    the weight of every further hop, between 0 and 1 (exclusive) unless hops is given.
+    #           The default is 0.5.
+    #hops       the number of hops of the walks: None (default) sums the walks of any length,
+    #           until convergence, while with an int k only the walks up to k hops are summed
+    #           (k = 1 gives the node influence scores).
+    #tol        the iterations stop when no score changes by more than tol. The default is 1e-8.
+    #max_iter   the maximum number of iterations. The default is 1000.
+    #The sum converges when damping times the spectral radius of P is lower than 1, which holds
+    #for damping < 1 as long as the edge influences are between -1 and 1 (as with the cosine
+    #similarity), but not necessarily otherwise (e.g. with the euclidean or manhattan ones).
+    #If the scores do not converge (their change is not finite, or larger than DIVERGING_ITERATIONS
+    #iterations before, or max_iter is reached) the iterations stop with a
+    #RuntimeWarning, and converged is False.
+    def __init__(self, E, edge_u = 'p1', edge_v = 'p2', damping = 0.5, hops = None, tol = 1e-8,
+                 max_iter = 1000):
+        self.E = E.reset_index()
+        self.edgeu = edge_u
+        self.edgev = edge_v
+        self.damping = damping
+        self.hops = hops
+        self.tol = tol
+        self.max_iter = max_iter
+
+        self.checkdata()
+
+        self.nodes = NodeDictionary(self.E.loc[:,edge_u], self.E.loc[:,edge_v])
+
+    def checkdata(self):
+        if not isinstance(self.E, pd.DataFrame):
+            raise TypeError('E should be a pandas DataFrame.')
+        for column in [self.edgeu, self.edgev, 'influence']:
+            if not column in self.E.columns:
+                raise ValueError('No ' + column + ' in E columns.')
+        if not isinstance(self.damping, (int, float)) or self.damping <= 0:
+            raise ValueError('damping should be a positive number.')
+        if self.hops is None and self.damping >= 1:
+            raise ValueError('damping should be lower than 1 unless hops is given.')
+        if self.hops is not None and (not isinstance(self.hops, int) or self.hops < 1):
+            raise ValueError('hops should be a positive int.')
+
+    #Splits the rows of the matrix P in chunks of similar number of entries for n_workers threads.
+    #It returns the row slices of the chunks and their blocks of P, which share the data of P.
+    @staticmethod
+    def row_blocks(P, n_workers):
+        nindexes, _ = exe.balanced_chunks(np.diff(P.indptr) + 1, n_workers)
+        blocks = []
+        for first, last in nindexes:
+            last += 1
+            entries = slice(P.indptr[first], P.indptr[last])
+            blocks.append((slice(first, last),
+                           sparse.csr_matrix((P.data[entries], P.indices[entries],
+                                              P.indptr[first:last + 1] - P.indptr[first]),
+                                             shape = (last - first, P.shape[1]))))
+        return blocks
+
+    #When the object is called the propagated influence is computed.
+    #n_workers  the number of threads running the matrix-vector products, each on a slice of rows
+    #           with a similar number of entries; the sparse products release the GIL.
+    #           The default (None) runs them in the calling thread.
+    #monitor    follows the progress of the computation as in NodeInfluence. Its phases are
+    #           prepare, compute (with the number of iterations and whether they converged) and
+    #           collect. The iterations, the last change of the scores and whether they converged
+    #           are also available in iterations, residual and converged.
+    #It returns a table with the list of nodes, their influence score, as NodeInfluence, and
+    #their propagated influence.
+    def __call__(self, n_workers = None, monitor = None):
+        monitor = get_monitor(monitor)
+        monitor.start('InfluencePropagation', 'nodes')
+
+        with monitor.phase('prepare'):
+            P = eng.signed_adjacency(len(self.nodes),
+                                     self.nodes.encode(self.E.loc[:,self.edgeu]),
+                                     self.nodes.encode(self.E.loc[:,self.edgev]),
+                                     self.E.loc[:,'influence'].values.astype(float))
+            n_workers = 1 if n_workers is None else n_workers
+            blocks = InfluencePropagation.row_blocks(P, n_workers)
+
+        with monitor.phase('compute') as info, \
+             ThreadPoolExecutor(max_workers = n_workers) as pool:
+            #the product of P with x, computed by the threads on the blocks of rows
+            def dot(x):
+                out = np.empty(P.shape[0])
+                def job(block):
+                    out[block[0]] = block[1].dot(x)
+                if n_workers > 1:
+                    list(pool.map(job, blocks))
+                else:
+                    for block in blocks:
+                        job(block)
+                return out
+
+            influence = dot(np.ones(P.shape[0]))
+            propagated = influence
+            self.iterations = 0
+            self.residual = 0.0
+            residuals = []
+            steps = self.max_iter if self.hops is None else self.hops - 1
+            while self.iterations < steps:
+                updated = influence + self.damping * dot(propagated)
+                residual = float(np.max(np.abs(updated - propagated))) if len(updated) else 0.0
+                residuals.append(residual)
+                self.residual = residual
+                propagated = updated
+                self.iterations += 1
+                growing = len(residuals) > DIVERGING_ITERATIONS and residual > residuals[-DIVERGING_ITERATIONS - 1]
+                if self.hops is None and (self.residual <= self.tol or not np.isfinite(self.residual) or growing):
+                    break
+            self.converged = self.hops is not None or self.residual <= self.tol
+            info['iterations'] = self.iterations
+            info['converged'] = self.converged
+            if not self.converged:
+                warnings.warn('The propagated influence did not converge after %d iterations (last change %g): '
+                              'damping may be too high for the edge influences.' % (self.iterations, self.residual),
+                              RuntimeWarning)
+
+        with monitor.phase('collect'):
+            scores = pd.DataFrame({'node': self.nodes.decode(np.arange(len(self.nodes))),
+                                   'influence': influence, 'propagated': propagated})
+        monitor.finish()
+        return scores
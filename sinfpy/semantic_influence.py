@@ -1,17 +1,24 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import copy
+import importlib.util
+from functools import partial
+
 import pandas as pd
 import numpy as np
+from scipy import sparse
 
-import psutil
-import ray
-
-from sinfpy.utils import number_of_peaks, balance_influence, similarity_fun
+from sinfpy.utils import number_of_peaks, balance_influence, similarity_fun, SIMILARITY_KERNELS
+from sinfpy import engine as eng
+from sinfpy import executors as exe
+from sinfpy.encoding import NodeDictionary
+from sinfpy.instrumentation import get_monitor, Monitor, log_events
+from sinfpy.checkpoint import get_checkpoint, fingerprint, function_name, Checkpoint
 
 #Default function to compute influence on a specific edge, which can be redefined.
 #It assumes all the columns in x being numbers, and relevant to the computation 
-#of the similarity
+#of the similarity: x only holds the properties selected by columns in EdgeInfluence.
 def properties_similarity(xi_old, xi_new, xj_old, xj_new, threshold, prev_inf, similarity_fun):
     influence = 0
     sim_i = similarity_fun(xi_old.iloc[0].tolist(),
@@ -28,6 +35,46 @@ def properties_similarity(xi_old, xi_new, xj_old, xj_new, threshold, prev_inf, s
     
     return influence
 
+#Marks fn as an influence function following the batched protocol, which EdgeInfluence runs
+#with the vectorized engine. The function computes the influence of many edges at one step
+#of the recurrence, with the signature
+#(xi_old, xi_new, xj_old, xj_new, threshold, prev_inf, similarity)
+#where xi_old, xi_new, xj_old and xj_new are aligned arrays of shape (n, d), with the properties
+#(the columns selected in EdgeInfluence) of the two nodes of n edges at the previous and current
+#timeframe, prev_inf is the array of the previous influence of the edges, and similarity is the
+#batched similarity kernel. It returns the array of the n influences.
+def batched_influence(fn):
+    fn.batched = True
+    return fn
+
+#Whether the influence function fn follows the batched protocol.
+def is_batched(fn):
+    return getattr(fn, 'batched', False)
+
+#Adapter running an influence function with the single-edge signature within the batched
+#protocol: the function is called edge by edge, on one-row DataFrames with the selected columns,
+#the same tables it receives from the pandas engine (see node_table).
+#It lets the vectorized engine run the functions written for the pandas engine.
+class EdgeFunctionAdapter:
+    def __init__(self, fn, columns):
+        self.fn = fn
+        self.columns = columns
+
+    def __call__(self, xi_old, xi_new, xj_old, xj_new, threshold, prev_inf, similarity):
+        row = lambda x, k : pd.DataFrame(x[k:k + 1], columns = self.columns)
+        return np.array([self.fn(row(xi_old, k), row(xi_new, k), row(xj_old, k), row(xj_new, k),
+                                 threshold, prev_inf[k], similarity) for k in range(len(prev_inf))],
+                        dtype = float)
+
+#Lightweight copy of an EdgeInfluence or NodeInfluence object, sent to the workers with the
+#parameters of the computation. The tables and the state are left out: the workers receive
+#their data as flat arrays, which the executors share without copying.
+def job_params(obj):
+    params = copy.copy(obj)
+    for k in ['E', 'X', 'state', 'nodes', 'job', 'workers_report']:
+        params.__dict__.pop(k, None)
+    return params
+
 class EdgeInfluence:
     #Initialization of the algorithm to compute the influence at the edge level.
     #E                      is the table of edges in the form of <p1, p2, timeframe, weight>.
@@ -41,9 +88,15 @@ class EdgeInfluence:
     #                       if a custom function is defined, the signature must be the following 
     #                       (xi_old, xi_new, xj_old, xj_new, threshold, prev_inf, similarity_fun)
     #                       the similarity_fun is the function used to compute the similarity, according to the method chosen
+    #                       xi_old, xi_new, xj_old and xj_new are the one-row tables of the properties of the
+    #                       two nodes at the previous and current timeframe, with only the columns selected by
+    #                       columns (neither the user id nor the timeframe), with both engines.
+    #                       Functions marked with batched_influence follow the batched protocol instead,
+    #                       computing the influence of many edges at once on arrays.
     #similarity             the function used to compute the similarity among the nodes' properties,
     #                       which can either be the cosine simiarity, the euclidean distance,
-    #                       or the manhattan distance.
+    #                       the manhattan distance, pearson, jaccard, or the name of any kernel
+    #                       registered with sinfpy.utils.register_similarity.
     #dynamic                can either be True or False, and specifies whether the graph is dynamic.
     #                       The default value is True.
     #threshold              specifies the minimum similarity to be considered as influence.
@@ -52,9 +105,22 @@ class EdgeInfluence:
     #                       to be balanced according to the edge's weight. The default value is True
     #penality               used if balance_inf is True. It specifies the penality applied to the
     #                       edge influence score.
+    #engine                 can either be 'pandas', 'vectorized' or 'auto'. The pandas engine runs the
+    #                       computing_influence function edge by edge on the workers, and does not
+    #                       support batched functions. The vectorized engine pivots X once into a
+    #                       (node, timeframe, attribute) array and computes the influence of all the
+    #                       edges with batched array operations: properties_similarity and the batched
+    #                       functions directly, the functions with the single-edge signature edge by
+    #                       edge through EdgeFunctionAdapter. Both engines compute the similarity on the
+    #                       columns of X selected by columns only, so that they return the same influence.
+    #                       'auto' (default) picks the vectorized engine for properties_similarity
+    #                       and the batched functions, and the pandas engine for the single-edge ones.
+    #columns                the columns of X used as properties by both engines, in the order of the
+    #                       tables received by computing_influence (and of the arrays received by batched
+    #                       functions). The default (None) is all the columns of X but user_id and timeframe.
     def __init__(self, E, X, user_id = 'characterId', edge_u = 'p1', edge_v = 'p2', timeframe = 'timeframe',
                 computing_influence = properties_similarity, similarity = 'cosine', dynamic = True,
-                threshold = 0.80, balance_inf = True, penality = 0.1):
+                threshold = 0.80, balance_inf = True, penality = 0.1, engine = 'auto', columns = None):
         self.E = E
         self.X = X
         self.userid = user_id
@@ -63,10 +129,20 @@ class EdgeInfluence:
         self.timeframe = timeframe
 
         self.similarity_method = similarity
+        self.kernel = SIMILARITY_KERNELS.get(similarity)
         self.computing_influence = computing_influence
         self.threshold = threshold
         self.balance = balance_inf
         self.penality = penality
+        self.dynamic = dynamic
+        self.columns = columns
+
+        if engine == 'auto':
+            if computing_influence is properties_similarity or is_batched(computing_influence):
+                engine = 'vectorized'
+            else:
+                engine = 'pandas'
+        self.engine = engine
 
         if dynamic:
             self.job = self.dynamic_net_job
@@ -74,11 +150,19 @@ class EdgeInfluence:
             self.job = self.static_net_job
 
         self.checkdata()
+        if self.columns is None:
+            self.columns = [c for c in self.X.columns if c not in [user_id, timeframe]]
+        self.columns = list(self.columns)
 
-        self.X.loc[:,user_id] = self.X.loc[:,user_id].astype(str)
+        #the ids of the nodes are encoded once as int32 codes, and decoded on output, in copies
+        #of the tables so that the ones of the caller are left unchanged
+        self.nodes = NodeDictionary(self.E.loc[:,edge_u], self.E.loc[:,edge_v], self.X.loc[:,user_id])
+        self.X = self.X.copy()
+        self.E = self.E.copy()
+        self.X[user_id] = self.nodes.encode(self.X.loc[:,user_id])
 
-        self.E.loc[:,edge_u] = self.E.loc[:,edge_u].astype(str)
-        self.E.loc[:,edge_v] = self.E.loc[:,edge_v].astype(str)
+        self.E[edge_u] = self.nodes.encode(self.E.loc[:,edge_u])
+        self.E[edge_v] = self.nodes.encode(self.E.loc[:,edge_v])
         self.E.set_index([edge_u,edge_v], inplace = True)
         self.E.sort_index(inplace = True)
     
@@ -89,6 +173,12 @@ class EdgeInfluence:
             raise TypeError('balance_inf should be a boolean.')
         if not isinstance(self.penality, float):
             raise TypeError('penality should be a float.')
+        if self.kernel is None:
+            raise ValueError('Illegal value for similarity, no definition for ' + str(self.similarity_method))
+        if not self.engine in ['pandas', 'vectorized']:
+            raise ValueError('engine should either be pandas, vectorized or auto.')
+        if self.engine == 'pandas' and is_batched(self.computing_influence):
+            raise ValueError('The pandas engine does not support batched functions.')
 
         if not isinstance(self.X, pd.DataFrame):
             raise TypeError('X should be a pandas DataFrame.')
@@ -97,6 +187,9 @@ class EdgeInfluence:
                 raise ValueError('No ' + self.userid + ' in X columns.')
             if not self.timeframe in self.X.columns:
                 raise ValueError('No ' + self.timeframe + ' in X columns.')
+            for c in self.columns if self.columns is not None else []:
+                if not c in self.X.columns:
+                    raise ValueError('No ' + str(c) + ' in X columns.')
         
         if not isinstance(self.E, pd.DataFrame):
             raise TypeError('E should be a pandas DataFrame.')
@@ -111,158 +204,464 @@ class EdgeInfluence:
         
 
 
+    #The similarity function passed to computing_influence: the function of the built-in
+    #methods, otherwise the kernel, which also accepts two vectors.
+    def similarity_function(self):
+        if self.similarity_method in ['cosine', 'euclidean', 'manhattan']:
+            return similarity_fun(self.similarity_method)
+        return self.kernel
+
+    #The table of the properties of a node, rebuilt from the columns of X sorted by node, and
+    #the timeframes of its rows. The table only has the columns selected by columns, as the
+    #tables received by computing_influence with both engines. Only the rows of the node are copied.
+    def node_table(self, x_ptr, x_columns, node):
+        rows = slice(x_ptr[node], x_ptr[node + 1])
+        return (pd.DataFrame({c : x_columns[c][rows] for c in self.columns}),
+                x_columns[self.timeframe][rows])
+
+    #The tables of a node at every timeframe of the sorted array timeframes, split once from the
+    #node table: a node without properties at a timeframe gets an empty table.
+    def timeframe_tables(self, x_ptr, x_columns, node, timeframes):
+        X, tf = self.node_table(x_ptr, x_columns, node)
+        order = np.argsort(tf, kind = 'stable')
+        X = X.iloc[order]
+        tf = tf[order]
+        start = np.searchsorted(tf, timeframes, side = 'left')
+        end = np.searchsorted(tf, timeframes, side = 'right')
+        return [X.iloc[s:e] for s, e in zip(start, end)]
+
     #The job for an individual worker computed on its slice of the data for a static network
     #where the edges do not vary in time.
-    @ray.remote
-    def static_net_job(self, E, X, edge_list, edges_slice_index):
-        E_slice = pd.DataFrame({self.edgeu : [x[0] for x in edge_list[range(edges_slice_index[0],edges_slice_index[1]+1)]],
-                                self.edgev : [x[1] for x in edge_list[range(edges_slice_index[0],edges_slice_index[1]+1)]],
-                                'influence': [0]*(edges_slice_index[1]+1-edges_slice_index[0])})
-        E_slice.set_index([self.edgeu,self.edgev], inplace = True)
-        
-        for e,_ in E_slice.iterrows():
+    #The job works on flat arrays: node_i and node_j are the codes of the two nodes of every
+    #edge, the one with the lowest id first, x_ptr and x_columns the columns of X sorted by node,
+    #and timeframes the sorted timeframes of X, which are the same for all the edges.
+    #The table of every node of the slice is split by timeframe only once.
+    #It returns the influences of the edges in the slice.
+    def static_net_job(self, node_i, node_j, x_ptr, x_columns, timeframes, edges_slice_index):
+        first, last = edges_slice_index[0], edges_slice_index[1] + 1
+        influences = np.zeros(last - first)
+        tables = {}
+
+        for k in range(first, last):
             
             influence = 0
 
-            i = str(min(int(e[0]), int(e[1])))
-            j = str(max(int(e[0]), int(e[1])))
-
-            Xi = X.loc[[i]].reset_index()
-            Xj = X.loc[[j]].reset_index()
+            for node in (node_i[k], node_j[k]):
+                if not node in tables:
+                    tables[node] = self.timeframe_tables(x_ptr, x_columns, node, timeframes)
+            Xi = tables[node_i[k]]
+            Xj = tables[node_j[k]]
 
-            timeframes =  list(set(X.loc[:,self.timeframe].unique().tolist() + Xj.loc[:,self.timeframe].unique().tolist()))
-            timeframes.sort()
-            prev_tf = timeframes[0]
-            
-            for tf in timeframes[1:]:
-                xi_old = Xi[Xi.loc[:,self.timeframe] == prev_tf]
-                xj_old = Xj[Xj.loc[:,self.timeframe] == prev_tf]
-                xi_new = Xi[Xi.loc[:,self.timeframe] == tf]
-                xj_new = Xj[Xj.loc[:,self.timeframe] == tf]
-    		
-                influence = self.computing_influence(xi_old, xi_new,
-                                                 xj_old, xj_new,
+            for t in range(1, len(timeframes)):
+                #a node without properties at either timeframe leaves the influence unchanged
+                if min(len(Xi[t - 1]), len(Xi[t]), len(Xj[t - 1]), len(Xj[t])) == 0:
+                    continue
+                influence = self.computing_influence(Xi[t - 1], Xi[t],
+                                                 Xj[t - 1], Xj[t],
                                                  self.threshold,
                                                  influence,
-                                                 similarity_fun(self.similarity_method))
+                                                 self.similarity_function())
             
                 if(self.balance):
-                    influence = balance_influence(influence,len(timeframes))
+                    influence = balance_influence(influence,len(timeframes),self.penality)
                     
-                E_slice.loc[e,'influence'] = influence
-                
-                prev_tf = tf 
+                influences[k - first] = influence
 
-        return E_slice.reset_index()
+        return influences
     
     #The job for an individual worker computed on its slice of the data for a dynamic network
     #where the edges may vary in time.
-    @ray.remote
-    def dynamic_net_job(self, E, X, edge_list, edges_slice_index):
-        E_slice = pd.DataFrame({self.edgeu : [x[0] for x in edge_list[range(edges_slice_index[0],edges_slice_index[1]+1)]],
-                                self.edgev : [x[1] for x in edge_list[range(edges_slice_index[0],edges_slice_index[1]+1)]],
-                                'influence': [0]*(edges_slice_index[1]+1-edges_slice_index[0])})
-        E_slice.set_index([self.edgeu,self.edgev], inplace = True)
-        
-        for e,_ in E_slice.iterrows():
+    #As for the static job, but the timeframes of the k-th edge are the ones of e_tf in
+    #[e_ptr[k], e_ptr[k+1]), sorted, and e_weight holds the weight of the edge at every timeframe.
+    def dynamic_net_job(self, node_i, node_j, x_ptr, x_columns, e_ptr, e_tf, e_weight, edges_slice_index):
+        first, last = edges_slice_index[0], edges_slice_index[1] + 1
+        influences = np.zeros(last - first)
+
+        for k in range(first, last):
             
             influence = 0
-            timeframes =  E.loc[pd.IndexSlice[e],self.timeframe].values
-            
-            if (isinstance(timeframes,np.float64) or len(timeframes) == 0):
+            if e_ptr[k + 1] - e_ptr[k] < 2:
                 continue
-            else:
-                timeframes = timeframes.tolist()
-            timeframes.sort()
-            i = str(min(int(e[0]), int(e[1])))
-            j = str(max(int(e[0]), int(e[1])))
-
-            prev_tf = timeframes[0]
-            Xi = X.loc[[i]].reset_index()
-            Xj = X.loc[[j]].reset_index()
+
+            prev_tf = e_tf[e_ptr[k]]
+            Xi, tf_i = self.node_table(x_ptr, x_columns, node_i[k])
+            Xj, tf_j = self.node_table(x_ptr, x_columns, node_j[k])
             
-            for tf in timeframes[1:]:
-                xi_old = Xi[Xi.loc[:,self.timeframe] == prev_tf]
-                xj_old = Xj[Xj.loc[:,self.timeframe] == prev_tf]
-                xi_new = Xi[Xi.loc[:,self.timeframe] == tf]
-                xj_new = Xj[Xj.loc[:,self.timeframe] == tf]
-    		
+            for s in range(e_ptr[k] + 1, e_ptr[k + 1]):
+                tf = e_tf[s]
+                xi_old = Xi[tf_i == prev_tf]
+                xj_old = Xj[tf_j == prev_tf]
+                xi_new = Xi[tf_i == tf]
+                xj_new = Xj[tf_j == tf]
+
+                #a node without properties at either timeframe leaves the influence unchanged
+                if min(len(xi_old), len(xi_new), len(xj_old), len(xj_new)) == 0:
+                    prev_tf = tf
+                    continue
                 influence = self.computing_influence(xi_old, xi_new,
                                                  xj_old, xj_new,
                                                  self.threshold,
                                                  influence,
-                                                 similarity_fun(self.similarity_method))
+                                                 self.similarity_function())
             
                 if(self.balance):
-                    w = E[[(e == i) and (t == tf) for i, t in \
-                                 zip(E.index, E.loc[:,self.timeframe])]].weight
-                    influence = balance_influence(influence, w)
+                    influence = balance_influence(influence, e_weight[s], self.penality)
                     
-                E_slice.loc[e,'influence'] = influence
+                influences[k - first] = influence
                 
                 prev_tf = tf
                 
-        return E_slice.reset_index()
+        return influences
             
+    #Prepares the arrays used by the vectorized engine. The steps (prev_tf, tf) of every edge
+    #are flattened into arrays sorted by edge and, within the edge, chronologically: the steps
+    #of the k-th edge are the ones in [step_ptr[k], step_ptr[k+1]).
+    #In a static network every edge steps through all the timeframes of the cube, so no steps
+    #are built: the edges are swept densely over the timeframe axis by static_vectorized_job.
+    #The norms of the properties of every node at every timeframe are computed once for the kernel.
+    #It returns the list of edges, the args of vectorized_job (or static_vectorized_job) and, for
+    #every edge, the position of its last timeframe on the timeframe axis of the cube.
+    def vectorized_data(self):
+        timeframes, cube, present = eng.attribute_cube(self.X, self.userid, self.timeframe,
+                                                       self.columns, len(self.nodes))
+
+        edge_list = self.E.index.unique()
+        i, j = self.nodes.ordered_ends(edge_list.get_level_values(0).values,
+                                       edge_list.get_level_values(1).values)
+
+        norms = eng.cube_norms(cube, self.kernel) if self.computing_influence is properties_similarity \
+                else np.zeros(0)
+
+        if not self.dynamic:
+            last_tf = np.full(len(edge_list), len(timeframes) - 1)
+            return edge_list, (job_params(self), cube, present, norms, i, j), last_tf
+
+        edge, tf, order = self.edge_rows(edge_list)
+        step = np.flatnonzero(edge[1:] == edge[:-1]) + 1
+        step_edge = edge[step]
+        last = np.flatnonzero(np.r_[edge[1:] != edge[:-1], len(edge) > 0])
+        last_tf = eng.timeframe_codes(timeframes, tf[last])
+        t_old = eng.timeframe_codes(timeframes, tf[step - 1])
+        t_new = eng.timeframe_codes(timeframes, tf[step])
+        if self.balance:
+            weight = self.E.loc[:,'weight'].values.astype(float)[order][step]
+        else:
+            weight = np.zeros(0)
+
+        step_ptr = np.r_[0, np.cumsum(np.bincount(step_edge, minlength = len(edge_list)))]
+
+        return edge_list, (job_params(self), cube, present, norms, i, j, step_ptr,
+                           t_old, t_new, weight), last_tf
+
+    #The rows of the edges table of a dynamic network sorted by edge and, within the edge,
+    #chronologically. It returns the position of the edge of every row in edge_list, its timeframe,
+    #and the order of the rows in E.
+    def edge_rows(self, edge_list):
+        E = self.E.reset_index()
+        edge = edge_list.get_indexer(pd.MultiIndex.from_frame(E.loc[:,[self.edgeu, self.edgev]]))
+        tf = E.loc[:,self.timeframe].values.astype(float)
+        order = np.lexsort((tf, edge))
+        return edge[order], tf[order], order
+
+    #The job of the vectorized engine for an individual worker, computed on its slice of edges.
+    #The similarities of all the steps of the slice are computed in batch over the attribute
+    #cube, and the recurrence is swept over time.
+    #It returns the array of influences of the edges in the slice.
+    def vectorized_job(self, cube, present, norms, node_i, node_j, step_ptr, t_old, t_new, weight,
+                       edges_slice_index):
+        first, last = edges_slice_index[0], edges_slice_index[1] + 1
+        steps = slice(step_ptr[first], step_ptr[last])
+        step_edge = np.repeat(np.arange(last - first), np.diff(step_ptr[first:last + 1]))
+
+        i = node_i[first:last][step_edge]
+        j = node_j[first:last][step_edge]
+        t_old = t_old[steps]
+        t_new = t_new[steps]
+        weight = weight[steps] if self.balance else None
+
+        if self.computing_influence is properties_similarity:
+            sim_i, sim_j, sim_ij, valid = eng.step_similarities(cube, present, norms, i, j,
+                                                                t_old, t_new, self.kernel)
+            return eng.influence_recurrence(last - first, step_edge, sim_i, sim_j, sim_ij, valid,
+                                            weight, self.threshold, self.balance, self.penality)
+
+        properties = lambda s : (cube[i[s], t_old[s]], cube[i[s], t_new[s]],
+                                 cube[j[s], t_old[s]], cube[j[s], t_new[s]])
+        return eng.function_recurrence(last - first, step_edge,
+                                       eng.valid_steps(present, i, j, t_old, t_new),
+                                       properties, weight, self.influence_function(), self.kernel,
+                                       self.threshold, self.balance, self.penality)
+
+    #The job of the vectorized engine for an individual worker in a static network, computed on
+    #its slice of edges: the recurrence is swept over the timeframes of the cube for all the edges
+    #of the slice at once (see engine.static_recurrence).
+    #It returns the array of influences of the edges in the slice.
+    def static_vectorized_job(self, cube, present, norms, node_i, node_j, edges_slice_index):
+        first, last = edges_slice_index[0], edges_slice_index[1] + 1
+        fn = None if self.computing_influence is properties_similarity else self.influence_function()
+        return eng.static_recurrence(cube, present, norms, node_i[first:last], node_j[first:last], fn,
+                                     self.kernel, self.threshold, self.balance, self.penality)
+
+    #The batched function run by the vectorized engine: computing_influence itself if it follows
+    #the batched protocol, otherwise its adapter.
+    def influence_function(self):
+        if is_batched(self.computing_influence):
+            return self.computing_influence
+        return EdgeFunctionAdapter(self.computing_influence, self.columns)
+
+    #Keeps the state needed to update the edge influence when a new timeframe arrives: for
+    #every edge its last timeframe, its last influence, and the properties of its two nodes
+    #at the last timeframe (NaN, and not present, if the node had no properties).
+    #The edges and their nodes are kept as codes.
+    def init_state(self, edge_list, args, last_tf, influence):
+        _, cube, present, _, i, j = args[:6]
+        xi, pi = eng.node_properties(cube, present, i, last_tf)
+        xj, pj = eng.node_properties(cube, present, j, last_tf)
+
+        self.state = {'edges' : edge_list, 'i' : i, 'j' : j,
+                      'influence' : influence.copy(),
+                      'xi' : xi, 'pi' : pi, 'xj' : xj, 'pj' : pj,
+                      'last_timeframe' : self.E.loc[:,self.timeframe].max()}
+
+    #Updates the edge influence with the edges E_new and the properties X_new of one or more
+    #new timeframes, which must follow the ones already processed. Only the edges active in the
+    #new timeframes are computed, starting from the state kept by the previous computation:
+    #the result is the same of a full computation over the whole history.
+    #It is available for dynamic networks, with the vectorized engine, after the object has
+    #been called once: static networks balance the influence of every step by the number of
+    #timeframes of X, which a new timeframe changes. It returns the updated table of edges, as
+    #when the object is called.
+    def update(self, E_new, X_new):
+        if not hasattr(self, 'state'):
+            raise ValueError('The edge influence should be computed before being updated.')
+        if not self.dynamic or self.engine != 'vectorized':
+            raise ValueError('update is only available for dynamic networks with the vectorized engine.')
+
+        E_new = E_new.reset_index(drop = self.edgeu in E_new.columns)
+        X_new = X_new.copy()
+        #new nodes get the following codes
+        E_new[self.edgeu] = self.nodes.extend(E_new.loc[:,self.edgeu])
+        E_new[self.edgev] = self.nodes.extend(E_new.loc[:,self.edgev])
+        X_new[self.userid] = self.nodes.extend(X_new.loc[:,self.userid])
+
+        timeframes = np.sort(E_new.loc[:,self.timeframe].unique())
+        if len(timeframes) > 0 and timeframes[0] <= self.state['last_timeframe']:
+            raise ValueError('The new timeframes should follow the ones already processed.')
+
+        X_tfs = X_new.loc[:,self.timeframe].values.astype(float)
+        for tf in timeframes:
+            self.update_timeframe(E_new[E_new.loc[:,self.timeframe] == tf],
+                                  X_new[X_tfs == float(tf)])
+            self.state['last_timeframe'] = tf
+
+        #the edges are returned in the order of their ids, as when the object is called
+        u = self.state['edges'].get_level_values(0).values
+        v = self.state['edges'].get_level_values(1).values
+        order = np.lexsort((self.nodes.keys[v], self.nodes.keys[u]))
+        return pd.DataFrame({self.edgeu : self.nodes.decode(u[order]),
+                             self.edgev : self.nodes.decode(v[order]),
+                             'influence' : self.state['influence'][order]})
+
+    #Advances the state by one timeframe, given its edges E_tf and properties X_tf.
+    def update_timeframe(self, E_tf, X_tf):
+        state = self.state
+        E_tf = E_tf.drop_duplicates(subset = [self.edgeu, self.edgev], keep = 'first')
+        X_tf = X_tf.drop_duplicates(subset = [self.userid], keep = 'first')
+
+        edges = pd.MultiIndex.from_frame(E_tf.loc[:,[self.edgeu, self.edgev]])
+        i, j = self.nodes.ordered_ends(E_tf.loc[:,self.edgeu].values, E_tf.loc[:,self.edgev].values)
+
+        #row of every node code in X_tf, -1 if the node has no properties
+        rows = np.full(len(self.nodes), -1)
+        rows[X_tf.loc[:,self.userid].values] = np.arange(len(X_tf))
+        values = X_tf.loc[:,self.columns].values.astype(float)
+        xi, pi = eng.node_properties(values[:,None,:], np.ones((len(X_tf), 1), dtype = bool),
+                                     rows[i], np.zeros(len(i), dtype = int))
+        xj, pj = eng.node_properties(values[:,None,:], np.ones((len(X_tf), 1), dtype = bool),
+                                     rows[j], np.zeros(len(j), dtype = int))
+
+        #edges already in the state take one step of the recurrence from their last timeframe
+        pos = state['edges'].get_indexer(edges)
+        old = np.flatnonzero(pos >= 0)
+        p = pos[old]
+        valid = state['pi'][p] & state['pj'][p] & pi[old] & pj[old]
+
+        weight = E_tf.loc[:,'weight'].values.astype(float)[old] if self.balance else None
+
+        if self.computing_influence is properties_similarity:
+            #the norms of the new properties are computed once per node
+            norms = self.kernel.norms(values)
+            ni = nj = None
+            if norms is not None:
+                ni = norms[rows[i[old][valid]]]
+                nj = norms[rows[j[old][valid]]]
+            sim_i = np.zeros(len(old))
+            sim_j = np.zeros(len(old))
+            sim_ij = np.zeros(len(old))
+            sim_i[valid] = self.kernel(state['xi'][p][valid], xi[old][valid], None, ni)
+            sim_j[valid] = self.kernel(state['xj'][p][valid], xj[old][valid], None, nj)
+            sim_ij[valid] = self.kernel(xi[old][valid], xj[old][valid], ni, nj)
+
+            state['influence'][p] = eng.influence_recurrence(len(old), np.arange(len(old)),
+                                                             sim_i, sim_j, sim_ij, valid, weight,
+                                                             self.threshold, self.balance, self.penality,
+                                                             initial = state['influence'][p])
+        else:
+            properties = lambda s : (state['xi'][p[s]], xi[old[s]], state['xj'][p[s]], xj[old[s]])
+            state['influence'][p] = eng.function_recurrence(len(old), np.arange(len(old)), valid,
+                                                            properties, weight, self.influence_function(),
+                                                            self.kernel, self.threshold, self.balance,
+                                                            self.penality, initial = state['influence'][p])
+        state['xi'][p], state['pi'][p] = xi[old], pi[old]
+        state['xj'][p], state['pj'][p] = xj[old], pj[old]
+
+        #new edges start with no influence, and are appended to the state
+        new = np.flatnonzero(pos < 0)
+        if len(new) > 0:
+            state['edges'] = state['edges'].append(edges[new])
+            state['i'] = np.r_[state['i'], i[new]]
+            state['j'] = np.r_[state['j'], j[new]]
+            state['influence'] = np.r_[state['influence'], np.zeros(len(new))]
+            state['xi'] = np.r_[state['xi'], xi[new]]
+            state['pi'] = np.r_[state['pi'], pi[new]]
+            state['xj'] = np.r_[state['xj'], xj[new]]
+            state['pj'] = np.r_[state['pj'], pj[new]]
+
+    #Returns an InfluenceWindows (see sinfpy.windows) answering the edge and node influence
+    #over time ranges and rolling windows of the edges and properties of the object.
+    #It is available with the vectorized engine and the default computing_influence.
+    def windows(self):
+        from sinfpy.windows import InfluenceWindows
+        return InfluenceWindows(self)
+
     #When the object is called the edge influence is computed.
     #The algorithm supports multiprocessing, so the number of available workers can be specified.
     #The default is None.
+    #executor   specifies how the chunks of edges are run. It can either be 'serial', 'threads',
+    #           'processes', 'ray', an Executor instance, or 'auto' (default), which uses ray (or
+    #           processes if ray is not installed) for the pandas engine, and serial (or threads if
+    #           n_workers > 1) for the vectorized one.
+    #The edges are split in many chunks of similar cost, estimated from the number of timeframes
+    #of the edges, which the workers pull as soon as they are idle. The chunks run by every worker,
+    #their cost and the seconds they took are then available in workers_report.
+    #monitor    follows the progress of the computation (see sinfpy.instrumentation): it can
+    #           either be a Monitor, a function receiving the events, or None (default).
+    #           Its phases are prepare, share (for the processes and ray executors), compute
+    #           and collect, and the throughput of the workers is in edges per second.
+    #checkpoint saves the result of every chunk as soon as it is completed, so that a computation
+    #           stopped before its end is resumed by calling the object again, on the same data and
+    #           parameters (see sinfpy.checkpoint): it can either be a Checkpoint, the path of its
+    #           directory, or None (default) to disable it.
     #It returns the updated table of edges E with the edge influence scores.
     #Important: the influence value refers to the node with the lowest id; for the other node the
     #edge influence score is -influence.
-    def __call__(self, n_workers = None):
-        
-        n_workers = psutil.cpu_count(logical=False) if n_workers == None else n_workers
-        available = psutil.virtual_memory()[1]
-        
-        edge_list = self.E.index.unique()
-        size = len(edge_list)
-        load = int(size/n_workers)
-        
-        ray.init(num_cpus=n_workers, 
-                 memory=available*0.6, object_store_memory=available*0.4)
-        
-        self.X = self.X.set_index(self.userid)
-        self.X.loc[:,self.timeframe] = self.X.loc[:,self.timeframe].astype(int)
-        
-        E_id = ray.put(self.E)
-        X_id = ray.put(self.X)
-        edge_list_id = ray.put(edge_list)
-        
-        eindexes = []
-        
-        if n_workers is None or n_workers < 2:
-            eindexes.append([0, len(edge_list_id)])
-        else:
-            eindexes = [ [start_index,start_index+load] \
-                for start_index in range(0, (n_workers - 1)*load, load) ]
+    def __call__(self, n_workers = None, executor = 'auto', monitor = None, checkpoint = None):
+        executor = self.get_executor(executor, n_workers)
+        monitor = get_monitor(monitor)
+        checkpoint = get_checkpoint(checkpoint)
+        monitor.start('EdgeInfluence', 'edges')
 
-            #last worker size may be bigger
-            start_index = (n_workers - 1)*load
-            eindexes.append([start_index, len(edge_list) - 1])
+        with monitor.phase('prepare'):
+            job, edge_list, args, last_tf, eindexes, costs = self.job_data(executor.n_workers)
+            if checkpoint.enabled:
+                eindexes, costs = checkpoint.open('EdgeInfluence', self.fingerprint(), eindexes, costs)
 
-        updated_E = ray.get([self.job.remote(self,E_id,X_id,edge_list_id, i) \
-                       for i in eindexes])
+        with monitor.phase('compute'):
+            influence = checkpoint.map(executor, job, args, eindexes, costs, monitor)
+        self.workers_report = exe.workers_report(executor.timings)
 
-        ray.shutdown()
-        
-        updated_E = pd.concat([df for df in updated_E], ignore_index = True)
-        
+        with monitor.phase('collect'):
+            influence = np.concatenate(influence) if len(influence) else np.zeros(0)
+            self.collect(edge_list, args, last_tf, influence)
+            updated_E = pd.DataFrame({self.edgeu : self.nodes.decode(edge_list.get_level_values(0).values),
+                                      self.edgev : self.nodes.decode(edge_list.get_level_values(1).values),
+                                      'influence' : influence})
+        monitor.finish()
         return updated_E
 
+    #Returns the executor specified by the executor parameter, resolving 'auto' as described in __call__.
+    def get_executor(self, executor, n_workers):
+        if executor == 'auto':
+            if self.engine == 'pandas':
+                executor = 'ray' if importlib.util.find_spec('ray') is not None else 'processes'
+            else:
+                executor = 'threads' if n_workers is not None and n_workers > 1 else 'serial'
+        return exe.get_executor(executor, n_workers)
+
+    #Prepares the computation of the edge influence on n_workers. It returns the job, the list of
+    #edges (as codes), the args of the job, the last timeframe of every edge (None for the pandas
+    #engine), and the chunks of edges with their costs.
+    def job_data(self, n_workers):
+        if self.engine == 'vectorized':
+            edge_list, args, last_tf = self.vectorized_data()
+            if not self.dynamic:
+                #all the edges step through the same timeframes
+                eindexes, costs = exe.balanced_chunks(np.ones(len(edge_list)), n_workers)
+                return EdgeInfluence.static_vectorized_job, edge_list, args, last_tf, eindexes, costs
+            #the cost of an edge grows with its number of steps
+            step_ptr = args[6]
+            eindexes, costs = exe.balanced_chunks(np.diff(step_ptr) + 1, n_workers)
+            return EdgeInfluence.vectorized_job, edge_list, args, last_tf, eindexes, costs
+
+        #the workers receive flat arrays instead of the tables
+        edge_list = self.E.index.unique()
+        i, j = self.nodes.ordered_ends(edge_list.get_level_values(0).values,
+                                       edge_list.get_level_values(1).values)
+        X = self.X.loc[:,[self.userid] + self.columns + [self.timeframe]].astype({self.timeframe : int})
+        x_ptr, x_columns = eng.node_columns(X, self.userid, len(self.nodes))
+
+        #the cost of an edge grows with the number of its timeframes
+        if self.job == self.dynamic_net_job:
+            e_ptr, e_tf, e_weight = eng.edge_timeframes(self.E, edge_list, self.timeframe,
+                                                        'weight' if self.balance else None)
+            args = (job_params(self), i, j, x_ptr, x_columns, e_ptr, e_tf,
+                    e_weight if self.balance else np.zeros(0))
+            cost = np.diff(e_ptr)
+        else:
+            args = (job_params(self), i, j, x_ptr, x_columns, np.unique(x_columns[self.timeframe]))
+            cost = np.ones(len(edge_list))
+        eindexes, costs = exe.balanced_chunks(cost, n_workers)
+        return self.job.__func__, edge_list, args, None, eindexes, costs
+
+    #Fingerprint of the edges, properties and parameters of the computation, used by the
+    #checkpoints. extra holds the parameters of the computations built on the edge influence.
+    def fingerprint(self, **extra):
+        params = {'user_id' : self.userid, 'edge_u' : self.edgeu, 'edge_v' : self.edgev,
+                  'timeframe' : self.timeframe, 'similarity' : self.similarity_method,
+                  'computing_influence' : function_name(self.computing_influence),
+                  'threshold' : self.threshold, 'balance_inf' : self.balance, 'penality' : self.penality,
+                  'dynamic' : self.dynamic, 'engine' : self.engine, 'columns' : self.columns}
+        params.update(extra)
+        return fingerprint([self.E, self.X], params)
+
+    #Keeps the state needed by update once the influence of all the edges is computed.
+    def collect(self, edge_list, args, last_tf, influence):
+        if self.engine == 'vectorized' and self.dynamic:
+            self.init_state(edge_list, args, last_tf, influence)
+
 
 class NodeInfluence:
     #Initialization of the algorithm to compute the node influence scores.
     #E          is the table of updated edges, with the edge influence
     #stats      if True computes also the number of peaks and the standart
     #           deviation of the edge influence for each node.
-    def __init__(self, E, edge_u = 'p1', edge_v = 'p2', stats = False):
+    #engine     can either be 'pandas' or 'sparse'. The pandas engine filters the edges
+    #           of every node on the workers. The sparse engine (default) builds the signed
+    #           node-edge incidence matrix and aggregates the nodes with sparse reductions.
+    #           Both engines return the same influence and number of peaks, while the standard
+    #           deviation may differ in the last digits (about 1e-16), as its sums are vectorized.
+    def __init__(self, E, edge_u = 'p1', edge_v = 'p2', stats = False, engine = 'sparse'):
         self.E = E.reset_index()
         self.stats = stats
         self.edgeu = edge_u
         self.edgev = edge_v
+        self.engine = engine
+
+        self.checkdata()
 
-        self.checkdata
+        self.nodes = NodeDictionary(self.E.loc[:,edge_u], self.E.loc[:,edge_v])
+        self.E[edge_u] = self.nodes.encode(self.E.loc[:,edge_u])
+        self.E[edge_v] = self.nodes.encode(self.E.loc[:,edge_v])
 
     def checkdata(self):
         if not isinstance(self.E, pd.DataFrame):
@@ -272,84 +671,282 @@ class NodeInfluence:
                 raise ValueError('No ' + self.edgeu + ' in E columns.')
             if not self.edgev in self.E.columns:
                 raise ValueError('No ' + self.edgev + ' in E columns.')
+        if not self.engine in ['pandas', 'sparse']:
+            raise ValueError('engine should either be pandas or sparse.')
         
     
-    #The job for an individual worker computed on its slice of the data
-    @ray.remote
-    def job(self, nodes_list, edges, nodes_slice_index):
+    #The job for an individual worker computed on its slice of the data.
+    #edge_u and edge_v are the codes of the two nodes of every edge, and influence its influence.
+    def job(self, nodes_list, edge_u, edge_v, influence, nodes_slice_index):
         influence_scores = pd.DataFrame({'node': nodes_list[range(nodes_slice_index[0],nodes_slice_index[1]+1)] })
-        influence_scores.loc[:,'influence'] = 0
-        if self.stats:
-            influence_scores.loc[:,'n_peaks'] = 0
-            influence_scores.loc[:,'std'] = 0
+        scores = np.zeros(len(influence_scores))
+        n_peaks = np.zeros(len(influence_scores), dtype = np.int64)
+        std = np.zeros(len(influence_scores))
         
         for i in range(len(influence_scores.node)):
             influence_sum = 0
             node = influence_scores.node[i]
-            edges_slice = edges.loc[list((edges.loc[:,self.edgeu] == node) | (edges.loc[:,self.edgev] == node)),:]
+            edges_slice = np.flatnonzero((edge_u == node) | (edge_v == node))
             inf_list = []
-            for j in range(len(edges_slice)):
-                e = edges_slice.iloc[[j],:]
-                influence = e['influence'].values[0]
-                influence = influence if e.loc[:,self.edgeu].values == node else -influence
-                influence_sum += influence
-                inf_list.append(influence)
+            for j in edges_slice:
+                inf = influence[j] if edge_u[j] == node else -influence[j]
+                influence_sum += inf
+                inf_list.append(inf)
             
-            influence_scores.loc[[i], 'influence'] = influence_sum/len(edges_slice)
+            scores[i] = influence_sum/len(edges_slice)
             
             if self.stats:
-                influence_scores.loc[[i], 'n_peaks'] = number_of_peaks(inf_list)
-                influence_scores.loc[[i], 'std'] = np.std(inf_list)
+                n_peaks[i] = number_of_peaks(inf_list)
+                std[i] = np.std(inf_list)
             
+        influence_scores.loc[:,'influence'] = scores
+        if self.stats:
+            influence_scores.loc[:,'n_peaks'] = n_peaks
+            influence_scores.loc[:,'std'] = std
         return influence_scores
     
+    #The job of the sparse engine for an individual worker, computed on its slice of nodes,
+    #i.e. on a slice of rows of the signed node-edge incidence matrix in CSR format.
+    #It returns the arrays of influence, number of peaks and std of the nodes in the slice.
+    def sparse_job(self, data, indices, indptr, n_edges, nodes_slice_index):
+        first, last = nodes_slice_index[0], nodes_slice_index[1] + 1
+        rows = slice(indptr[first], indptr[last])
+        M = sparse.csr_matrix((data[rows], indices[rows], indptr[first:last + 1] - indptr[first]),
+                              shape = (last - first, n_edges))
+        influence, _, std, n_peaks = eng.incidence_aggregates(M, self.stats)
+        return influence, n_peaks, std
+
     #When the object is called the node influence is computed.
     #The algorithm supports multiprocessing, so the number of available workers can be specified.
     #The default is None.
+    #executor   specifies how the chunks of nodes are run. It can either be 'serial', 'threads',
+    #           'processes', 'ray', an Executor instance, or 'auto' (default), which uses ray
+    #           for the pandas engine, and serial (or threads if n_workers > 1) for the sparse one.
+    #As for EdgeInfluence, the nodes are split in chunks of similar cost, estimated from the number
+    #of edges of the nodes, and the per-worker timings are available in workers_report.
+    #monitor    follows the progress of the computation as in EdgeInfluence, the throughput of
+    #           the workers is in nodes per second.
+    #checkpoint saves the result of every chunk of nodes, as in EdgeInfluence.
     #It returns a table with the list of nodes and the influence score, as the stats if the param is True.
-    def __call__(self, n_workers = None):
-        n_workers = psutil.cpu_count(logical=False) if n_workers == None else n_workers
-        available = psutil.virtual_memory()[1]
-        
-        nodes_list = np.array(list(set(self.E.loc[:,self.edgeu].tolist() +
-                        self.E.loc[:,self.edgev].tolist())))
-        size = len(nodes_list)
-        load = int(size/n_workers)
-    
-        ray.init(num_cpus=n_workers, 
-                 memory=available*0.6, object_store_memory=available*0.4)
-        
-        E_id = ray.put(self.E)
-        nodes_list_id = ray.put(nodes_list)
+    def __call__(self, n_workers = None, executor = 'auto', monitor = None, checkpoint = None):
+        if executor == 'auto':
+            if self.engine == 'pandas':
+                executor = 'ray' if importlib.util.find_spec('ray') is not None else 'processes'
+            else:
+                executor = 'threads' if n_workers is not None and n_workers > 1 else 'serial'
+        executor = exe.get_executor(executor, n_workers)
+        monitor = get_monitor(monitor)
+        checkpoint = get_checkpoint(checkpoint)
+        monitor.start('NodeInfluence', 'nodes')
 
-        nindexes = []
-        
-        if n_workers is None or n_workers < 2:
-            nindexes.append([0, len(nodes_list_id)])
-        else:
-            nindexes = [ [start_index,start_index+load] \
-                for start_index in range(0, (n_workers - 1)*load, load) ]
-            
-            #last worker size may be bigger
-            start_index = (n_workers - 1)*load
-            nindexes.append([start_index, len(nodes_list) - 1])
-        
-        influence_scores = ray.get([self.job.remote(self,nodes_list_id,E_id,i) \
-                       for i in nindexes])
+        with monitor.phase('prepare'):
+            #the nodes are their codes, in the order of their ids
+            nodes_list = np.arange(len(self.nodes), dtype = np.int32)
+            M = eng.incidence_matrix(len(self.nodes),
+                                     self.E.loc[:,self.edgeu].values,
+                                     self.E.loc[:,self.edgev].values,
+                                     self.E.loc[:,'influence'].values)
 
-        ray.shutdown()
-        
-        influence_scores = pd.concat([df for df in influence_scores], ignore_index = True)
+            #the cost of a node grows with the number of its edges
+            nindexes, costs = exe.balanced_chunks(np.diff(M.indptr) + 1, executor.n_workers)
+            if checkpoint.enabled:
+                params = {'edge_u' : self.edgeu, 'edge_v' : self.edgev, 'stats' : self.stats,
+                          'engine' : self.engine}
+                nindexes, costs = checkpoint.open('NodeInfluence', fingerprint([self.E], params), nindexes, costs)
+
+        if self.engine == 'sparse':
+            with monitor.phase('compute'):
+                scores = checkpoint.map(executor, NodeInfluence.sparse_job,
+                                        (job_params(self), M.data, M.indices, M.indptr, M.shape[1]),
+                                        nindexes, costs, monitor)
+            self.workers_report = exe.workers_report(executor.timings)
+
+            with monitor.phase('collect'):
+                influence_scores = pd.DataFrame({'node': self.nodes.decode(nodes_list),
+                                                 'influence': np.concatenate([s[0] for s in scores])})
+                if self.stats:
+                    influence_scores.loc[:,'n_peaks'] = np.concatenate([s[1] for s in scores])
+                    influence_scores.loc[:,'std'] = np.concatenate([s[2] for s in scores])
+
+                self.init_state(M, influence_scores)
+            monitor.finish()
+            return influence_scores
+
+        with monitor.phase('compute'):
+            influence_scores = checkpoint.map(executor, self.job.__func__,
+                                              (job_params(self), nodes_list, self.E.loc[:,self.edgeu].values,
+                                               self.E.loc[:,self.edgev].values,
+                                               self.E.loc[:,'influence'].values.astype(float)),
+                                              nindexes, costs, monitor)
+        self.workers_report = exe.workers_report(executor.timings)
         
+        with monitor.phase('collect'):
+            influence_scores = pd.concat([df for df in influence_scores], ignore_index = True)
+            influence_scores['node'] = self.nodes.decode(influence_scores.loc[:,'node'].values)
+
+            self.init_state(M, influence_scores)
+        monitor.finish()
         return influence_scores
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
\ No newline at end of file
+
+    #Keeps the running aggregates of every node (sum and number of the signed influences of
+    #its edges, and its stats) and the influence of every edge, so that the scores can be
+    #updated when some edges change. Nodes and edges are kept as codes.
+    def init_state(self, M, influence_scores):
+        ones = np.ones(M.shape[1])
+        self.state = {'sum' : M.dot(ones),
+                      'count' : np.diff(M.indptr).astype(float),
+                      'edges' : pd.Series(self.E.loc[:,'influence'].values.astype(float),
+                                          index = pd.MultiIndex.from_frame(self.E.loc[:,[self.edgeu, self.edgev]]))}
+        if self.stats:
+            self.state['n_peaks'] = influence_scores.loc[:,'n_peaks'].values.astype(np.int64)
+            self.state['std'] = influence_scores.loc[:,'std'].values.astype(float)
+
+    #Updates the node influence scores given the updated table of edges E, e.g. as returned
+    #by EdgeInfluence.update, where edges may have changed influence or be new. The edges
+    #missing from E are removed from the scores of their nodes, and the nodes left without
+    #edges are dropped, as if the scores were computed again on E.
+    #Only the changed and removed edges are folded into the running aggregates of their nodes,
+    #and the number of peaks and standard deviation are recomputed only for their nodes, from
+    #their edges as when the object is called.
+    #It returns the table of node influence scores, as when the object is called; new nodes
+    #are appended at the end.
+    def update(self, E):
+        if not hasattr(self, 'state'):
+            raise ValueError('The node influence should be computed before being updated.')
+        state = self.state
+
+        self.E = E.reset_index()
+        self.checkdata()
+        #new nodes get the following codes
+        n_nodes = len(self.nodes)
+        self.E[self.edgeu] = self.nodes.extend(self.E.loc[:,self.edgeu])
+        self.E[self.edgev] = self.nodes.extend(self.E.loc[:,self.edgev])
+        edges = pd.MultiIndex.from_frame(self.E.loc[:,[self.edgeu, self.edgev]])
+        influence = self.E.loc[:,'influence'].values.astype(float)
+
+        previous = state['edges'].reindex(edges).values
+        new = np.isnan(previous)
+        changed = np.flatnonzero(new | (previous != influence))
+        #the edges missing from E are removed, with their previous influence
+        removed = ~state['edges'].index.isin(edges)
+
+        #new nodes are appended to the state
+        n_new = len(self.nodes) - n_nodes
+        if n_new > 0:
+            for k in ['sum', 'count']:
+                state[k] = np.r_[state[k], np.zeros(n_new)]
+            if self.stats:
+                state['n_peaks'] = np.r_[state['n_peaks'], np.zeros(n_new, dtype = np.int64)]
+                state['std'] = np.r_[state['std'], np.zeros(n_new)]
+
+        u = self.E.loc[:,self.edgeu].values
+        v = self.E.loc[:,self.edgev].values
+        cu = np.r_[u[changed], state['edges'].index.get_level_values(0).values[removed]]
+        cv = np.r_[v[changed], state['edges'].index.get_level_values(1).values[removed]]
+        delta = np.r_[influence[changed] - np.nan_to_num(previous[changed]), -state['edges'].values[removed]]
+        delta_count = np.r_[new[changed], -np.ones(removed.sum())]
+        loop = cu == cv
+        np.add.at(state['sum'], cu, delta)
+        np.add.at(state['sum'], cv[~loop], -delta[~loop])
+        np.add.at(state['count'], cu, delta_count)
+        np.add.at(state['count'], cv[~loop], delta_count[~loop])
+        state['sum'][state['count'] == 0] = 0
+        state['edges'] = pd.Series(influence, index = edges)
+
+        #the nodes left without edges are dropped
+        nodes = np.flatnonzero(state['count'] > 0)
+        influence_scores = pd.DataFrame({'node': self.nodes.decode(nodes),
+                                         'influence': state['sum'][nodes] / state['count'][nodes]})
+
+        if self.stats:
+            affected = np.unique(np.r_[cu, cv])
+            affected = affected[state['count'][affected] > 0]
+            is_affected = np.zeros(len(self.nodes), dtype = bool)
+            is_affected[affected] = True
+            rows = np.flatnonzero(is_affected[u] | is_affected[v])
+            M = eng.incidence_matrix(len(self.nodes), u[rows], v[rows], influence[rows])
+            _, _, std, n_peaks = eng.incidence_aggregates(M[affected], self.stats)
+            state['std'][affected] = std
+            state['n_peaks'][affected] = n_peaks
+
+            influence_scores.loc[:,'n_peaks'] = state['n_peaks'][nodes]
+            influence_scores.loc[:,'std'] = state['std'][nodes]
+
+        return influence_scores
+
+
+class SemanticInfluence:
+    #Pipeline computing the edge and node influence in a single pass.
+    #The influence of every chunk of edges is folded into the aggregates of its nodes (sum and
+    #number of the signed influences) by the same worker that computed it, so that the executor
+    #is started once, the edges are sent to the workers once, and the node scores are obtained
+    #by adding the partial aggregates of the chunks, as computed by NodeInfluence on the updated
+    #table of edges. The stats are computed from the updated edges, as by NodeInfluence.
+    #E, X       the tables of edges and properties, as for EdgeInfluence.
+    #stats      if True computes also the number of peaks and the standard deviation of the
+    #           edge influence for each node, as NodeInfluence.
+    #params     the other parameters of EdgeInfluence (e.g. dynamic, threshold, engine).
+    def __init__(self, E, X, stats = False, **params):
+        self.stats = stats
+        self.edge_influence = EdgeInfluence(E, X, **params)
+
+    #When the object is called the edge and node influence are computed.
+    #n_workers, executor and monitor are as for EdgeInfluence; the throughput of the workers
+    #is in edges per second, and the per-worker timings are available in workers_report.
+    #edges      if True the updated table of edges is also built and returned.
+    #checkpoint saves the result of every chunk of edges, as in EdgeInfluence.
+    #It returns the table of node influence scores as NodeInfluence, or the updated table of
+    #edges and the node influence scores if edges is True.
+    def __call__(self, n_workers = None, executor = 'auto', monitor = None, edges = False, checkpoint = None):
+        ei = self.edge_influence
+        executor = ei.get_executor(executor, n_workers)
+        monitor = get_monitor(monitor)
+        checkpoint = get_checkpoint(checkpoint)
+        monitor.start('SemanticInfluence', 'edges')
+
+        with monitor.phase('prepare'):
+            job, edge_list, args, last_tf, eindexes, costs = ei.job_data(executor.n_workers)
+            if checkpoint.enabled:
+                eindexes, costs = checkpoint.open('SemanticInfluence', ei.fingerprint(), eindexes, costs)
+            u = edge_list.get_level_values(0).values
+            v = edge_list.get_level_values(1).values
+
+        with monitor.phase('compute'):
+            results = checkpoint.map(executor, partial(fused_job, job), (u, v) + tuple(args), eindexes, costs,
+                                     monitor)
+        self.workers_report = exe.workers_report(executor.timings)
+
+        with monitor.phase('collect'):
+            influence = np.concatenate([r[0] for r in results]) if len(results) else np.zeros(0)
+            ei.collect(edge_list, args, last_tf, influence)
+
+            totals = np.zeros((2, len(ei.nodes)))
+            for _, nodes, partials in results:
+                totals[:,nodes] += partials
+            #the nodes of the edges, in the order of their ids
+            nodes = np.flatnonzero(totals[1] > 0)
+            influence_sum, count = totals[:,nodes]
+            mean = influence_sum / count
+
+            influence_scores = pd.DataFrame({'node': ei.nodes.decode(nodes), 'influence': mean})
+            if self.stats:
+                M = eng.incidence_matrix(len(ei.nodes), u, v, influence)
+                _, _, std, n_peaks = eng.incidence_aggregates(M[nodes], self.stats)
+                influence_scores.loc[:,'n_peaks'] = n_peaks
+                influence_scores.loc[:,'std'] = std
+
+            if edges:
+                updated_E = pd.DataFrame({ei.edgeu : ei.nodes.decode(u), ei.edgev : ei.nodes.decode(v),
+                                          'influence' : influence})
+        monitor.finish()
+        return (updated_E, influence_scores) if edges else influence_scores
+
+#The job of SemanticInfluence for an individual worker: it computes the influence of its slice
+#of edges with the job of EdgeInfluence, and folds it into the aggregates of their nodes u and v.
+#It returns the influence of the edges, the nodes and their partial aggregates.
+def fused_job(job, u, v, *args):
+    edges_slice_index = args[-1]
+    influence = job(*args)
+    rows = slice(edges_slice_index[0], edges_slice_index[1] + 1)
+    nodes, partials = eng.node_partials(u[rows], v[rows], influence)
+    return influence, nodes, partials
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+#Version of the format of the stores.
+STORE_VERSION = 1
+
+#Store of the results of EdgeInfluence and NodeInfluence (or of stream_influence, with the
+#timeframe column), indexed to answer the queries of the dashboards without loading and
+#sorting the whole tables: the top-k edges or nodes by influence in a range of timeframes,
+#and the edges (or scores) of a node in a range of timeframes.
+#A store is a directory with a subdirectory for every table (edges, nodes), holding every
+#column and index as a .npy file, which is memory-mapped when the store is opened: the queries
+#only read the pages of the rows they return.
+#The ids of the nodes are stored once, sorted, and the tables hold their codes. Every table
+#has three indexes:
+#timeframe  the rows are sorted by timeframe, so that the rows of a range of timeframes are
+#           contiguous, found by binary search on the sorted timeframes.
+#influence  within every timeframe the rows are sorted by decreasing influence, so that the
+#           top-k of every timeframe are its first (or last) k rows: the top-k of a range of
+#           timeframes are selected with a partial sort of the first k rows of its timeframes.
+#node       the rows of every node (both ends of the edges), sorted by timeframe, are listed
+#           contiguously with a pointer per node, so that the rows of a node in a range of
+#           timeframes are found in O(log n + k).
+#Tables without the timeframe column are a single timeframe.
+
+#Writes the tables of edges (e.g. as returned by EdgeInfluence) and of node influence scores
+#(e.g. as returned by NodeInfluence) to the store in the directory path, replacing the tables
+#already in it, and returns the opened store. Either table can be None.
+def write_store(path, edges = None, nodes = None, edge_u = 'p1', edge_v = 'p2', node = 'node',
+                timeframe = 'timeframe'):
+    tables = {}
+    if edges is not None:
+        tables['edges'] = (edges.reset_index(drop = not edge_u in edges.index.names), [edge_u, edge_v])
+    if nodes is not None:
+        tables['nodes'] = (nodes.reset_index(drop = not node in nodes.index.names), [node])
+    for name, (table, node_columns) in tables.items():
+        for column in node_columns + ['influence']:
+            if not column in table.columns:
+                raise ValueError('No ' + column + ' in ' + name + ' columns.')
+
+    #the ids of the nodes of all the tables, sorted, of which the tables store the codes
+    ids = pd.Index(np.concatenate([table.loc[:,c].values for table, columns in tables.values()
+                                   for c in columns])).unique()
+    ids = np.asarray(ids) if pd.api.types.is_numeric_dtype(ids.dtype) else np.asarray(ids, dtype = str)
+    ids = np.unique(ids)
+
+    os.makedirs(path, exist_ok = True)
+    np.save(os.path.join(path, 'ids.npy'), ids)
+    meta = {'version' : STORE_VERSION, 'timeframe' : timeframe, 'tables' : {}}
+    for name, (table, node_columns) in tables.items():
+        meta['tables'][name] = _write_table(os.path.join(path, name), table, node_columns, ids, timeframe)
+
+    with open(os.path.join(path, 'meta.json.tmp'), 'w') as f:
+        json.dump(meta, f, indent = 2)
+    os.replace(os.path.join(path, 'meta.json.tmp'), os.path.join(path, 'meta.json'))
+    return InfluenceStore(path)
+
+#Writes a table and its indexes to the directory path, and returns its description.
+def _write_table(path, table, node_columns, ids, timeframe):
+    n = len(table)
+    influence = table.loc[:,'influence'].values.astype(float)
+    tf = table.loc[:,timeframe].values.astype(float) if timeframe in table.columns else np.zeros(n)
+    #sorted by timeframe and by decreasing influence
+    order = np.lexsort((-influence, tf))
+    tf = tf[order]
+
+    os.makedirs(path, exist_ok = True)
+    columns = []
+    for column in table.columns:
+        values = table.loc[:,column].values[order]
+        if column in node_columns:
+            values = np.searchsorted(ids, values.astype(ids.dtype) if ids.dtype.kind == 'U' else values)
+            values = values.astype(np.int32)
+        elif values.dtype == object:
+            values = np.asarray(values, dtype = str)
+        np.save(os.path.join(path, 'column_%d.npy' % len(columns)), values)
+        columns.append(str(column))
+
+    #the timeframe index: the sorted timeframes and the first row of every timeframe
+    tf_values, tf_ptr = np.unique(tf, return_index = True)
+    np.save(os.path.join(path, 'tf_values.npy'), tf_values)
+    np.save(os.path.join(path, 'tf_ptr.npy'), np.r_[tf_ptr, n].astype(np.int64))
+
+    #the node index: the rows of every node, sorted by timeframe (a self-loop is listed once)
+    u = np.load(os.path.join(path, 'column_%d.npy' % columns.index(str(node_columns[0]))))
+    rows = np.arange(n)
+    node_codes = u
+    if len(node_columns) == 2:
+        v = np.load(os.path.join(path, 'column_%d.npy' % columns.index(str(node_columns[1]))))
+        loop = u == v
+        node_codes = np.concatenate([u, v[~loop]])
+        rows = np.concatenate([rows, rows[~loop]])
+    node_order = np.lexsort((rows, node_codes))
+    np.save(os.path.join(path, 'node_rows.npy'), rows[node_order].astype(np.int64))
+    np.save(os.path.join(path, 'node_ptr.npy'),
+            np.r_[0, np.cumsum(np.bincount(node_codes, minlength = len(ids)))].astype(np.int64))
+
+    return {'columns' : columns, 'node_columns' : [str(c) for c in node_columns], 'rows' : n,
+            'timeframe' : timeframe in table.columns}
+
+class InfluenceStore:
+    #Opens the store in the directory path, memory-mapping its arrays.
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError('The store in ' + path + ' has an unsupported version.')
+        self.timeframe = self.meta['timeframe']
+        self.ids = self.load('ids.npy')
+        self.tables = {}
+
+    def load(self, *name):
+        return np.load(os.path.join(self.path, *name), mmap_mode = 'r')
+
+    #Returns the memory-mapped arrays of the table name.
+    def table(self, name):
+        if not name in self.meta['tables']:
+            raise ValueError('No ' + name + ' table in the store.')
+        if not name in self.tables:
+            desc = self.meta['tables'][name]
+            arrays = {c : self.load(name, 'column_%d.npy' % k) for k, c in enumerate(desc['columns'])}
+            for index in ['tf_values', 'tf_ptr', 'node_rows', 'node_ptr']:
+                arrays[index] = self.load(name, index + '.npy')
+            self.tables[name] = (desc, arrays)
+        return self.tables[name]
+
+    #Returns the sorted timeframes of the table name.
+    def timeframes(self, name):
+        desc, arrays = self.table(name)
+        return np.asarray(arrays['tf_values']) if desc['timeframe'] else np.zeros(0)
+
+    #Returns the rows of the table name, given their positions, with the ids of the nodes.
+    def rows(self, name, positions):
+        desc, arrays = self.table(name)
+        positions = np.asarray(positions, dtype = np.int64)
+        table = pd.DataFrame({c : np.asarray(arrays[c][positions]) for c in desc['columns']})
+        for c in desc['node_columns']:
+            table[c] = np.asarray(self.ids[table.loc[:,c].values])
+        return table
+
+    #The first and last row (excluded) of the timeframes of table name in time_range, given as
+    #(first, last) with both ends included (None for no bound), and the first row of every
+    #timeframe in between.
+    def time_rows(self, name, time_range):
+        desc, arrays = self.table(name)
+        ptr = arrays['tf_ptr']
+        if time_range is None or not desc['timeframe']:
+            return np.asarray(ptr)
+        first, last = time_range
+        values = arrays['tf_values']
+        a = 0 if first is None else np.searchsorted(values, float(first), side = 'left')
+        b = len(values) if last is None else np.searchsorted(values, float(last), side = 'right')
+        return np.asarray(ptr[a:b + 1]) if b > a else np.zeros(1, dtype = np.int64)
+
+    #Returns all the rows of the table name in time_range, sorted by timeframe and decreasing influence.
+    def range(self, name, time_range = None):
+        ptr = self.time_rows(name, time_range)
+        return self.rows(name, np.arange(ptr[0], ptr[-1]))
+
+    #Returns the k rows of the table name with the highest influence in time_range (the lowest if
+    #ascending, e.g. the most susceptible nodes, or the highest absolute influence if absolute),
+    #sorted by influence.
+    #Only the first (and last) k rows of every timeframe in the range are read, and the top-k
+    #among them are selected with a partial sort.
+    def top(self, name, k = 100, time_range = None, ascending = False, absolute = False):
+        desc, arrays = self.table(name)
+        ptr = self.time_rows(name, time_range)
+        start, end = ptr[:-1], ptr[1:]
+        #the candidates are the first k rows of every timeframe, or the last k, or both
+        heads = []
+        if not ascending or absolute:
+            heads.append(_ranges(start, np.minimum(start + k, end)))
+        if ascending or absolute:
+            heads.append(_ranges(np.maximum(end - k, start), end))
+        candidates = np.unique(np.concatenate(heads)) if len(heads) > 1 else heads[0]
+
+        influence = np.asarray(arrays['influence'][candidates])
+        key = -np.abs(influence) if absolute else (influence if ascending else -influence)
+        if len(candidates) > k:
+            selected = np.argpartition(key, k - 1)[:k]
+            candidates, key = candidates[selected], key[selected]
+        return self.rows(name, candidates[np.argsort(key, kind = 'stable')]).reset_index(drop = True)
+
+    #Returns the rows of the table name of the node with the given id in time_range, e.g. its edges
+    #or its scores over time, sorted by timeframe, or by decreasing influence (sort = 'influence')
+    #or absolute influence (sort = 'abs').
+    def node(self, node, name = 'edges', time_range = None, sort = None):
+        desc, arrays = self.table(name)
+        if not sort in [None, 'influence', 'abs']:
+            raise ValueError('sort should either be None, influence or abs.')
+        key = str(node) if self.ids.dtype.kind == 'U' else node
+        code = np.searchsorted(self.ids, key)
+        if code >= len(self.ids) or self.ids[code] != key:
+            return self.rows(name, np.zeros(0, dtype = np.int64))
+
+        rows = arrays['node_rows'][arrays['node_ptr'][code]:arrays['node_ptr'][code + 1]]
+        #the rows of the node are sorted by timeframe, as the rows of the table
+        if time_range is not None and desc['timeframe']:
+            ptr = self.time_rows(name, time_range)
+            rows = rows[np.searchsorted(rows, ptr[0]):np.searchsorted(rows, ptr[-1])]
+        table = self.rows(name, rows)
+        if sort is not None:
+            influence = table.loc[:,'influence'].values
+            table = table.iloc[np.argsort(-(np.abs(influence) if sort == 'abs' else influence), kind = 'stable')]
+        return table.reset_index(drop = True)
+
+#Concatenates the ranges [start, end) of positions.
+def _ranges(start, end):
+    lengths = np.maximum(end - start, 0)
+    offsets = np.repeat(start - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return np.arange(lengths.sum()) + offsets
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from sinfpy import engine as eng
+from sinfpy import executors as exe
+from sinfpy.instrumentation import get_monitor
+from sinfpy.semantic_influence import EdgeInfluence, properties_similarity, job_params
+from sinfpy.utils import similarity_kernel
+
+#Computes the edge and node influence for a grid of parameters, e.g. to tune them or to study
+#how sensitive the scores are to them. The similarities sim_i, sim_j and sim_ij of every step
+#do not depend on threshold and penality, so they are computed once for every similarity
+#method, and the recurrence (and the penality of balance_influence) is run for all the pairs
+#(threshold, penality) of the grid at once, on the same chunks of edges.
+#E, X           the tables of edges and properties, as for EdgeInfluence.
+#thresholds     the values of threshold (default the one in params, or 0.80).
+#penalities     the values of penality (default the one in params, or 0.1).
+#similarities   the similarity methods (default the one in params, or cosine).
+#stats          if True computes also the number of peaks and the standard deviation of the
+#               edge influence for each node, as NodeInfluence.
+#params         the other parameters of EdgeInfluence (e.g. dynamic, balance_inf, columns).
+#               The sweep supports the default computing_influence on the vectorized engine.
+#n_workers, executor and monitor are as for EdgeInfluence.
+#It returns two tidy tables, with a row for every combination of similarity, threshold and
+#penality and every edge (respectively node): the edge influence, with the columns similarity,
+#threshold, penality, the two nodes of the edge and influence, and the node influence, with
+#the columns similarity, threshold, penality, node and influence (and n_peaks and std if stats).
+def influence_sweep(E, X, thresholds = None, penalities = None, similarities = None, stats = False,
+                    n_workers = None, executor = 'auto', monitor = None, **params):
+    if params.get('computing_influence', properties_similarity) is not properties_similarity:
+        raise ValueError('The sweep only supports the default computing_influence.')
+    if params.get('engine', 'auto') == 'pandas':
+        raise ValueError('The sweep only supports the vectorized engine.')
+    params['engine'] = 'vectorized'
+
+    ei = EdgeInfluence(E, X, **params)
+    thresholds = [ei.threshold] if thresholds is None else [float(t) for t in thresholds]
+    penalities = [ei.penality] if penalities is None else [float(p) for p in penalities]
+    similarities = [ei.similarity_method] if similarities is None else list(similarities)
+    kernels = [similarity_kernel(s) for s in similarities]
+
+    executor = ei.get_executor(executor, n_workers)
+    monitor = get_monitor(monitor)
+    monitor.start('influence_sweep', 'edges')
+
+    with monitor.phase('prepare'):
+        edge_list, args, _ = ei.vectorized_data()
+        _, cube, present, _, i, j = args[:6]
+        if ei.dynamic:
+            step_ptr, t_old, t_new, weight = args[6:]
+            #the cost of an edge grows with its number of steps
+            cost = np.diff(step_ptr) + 1
+        else:
+            step_ptr = t_old = t_new = weight = np.zeros(0, dtype = np.int64)
+            cost = np.ones(len(edge_list))
+        eindexes, costs = exe.balanced_chunks(cost, executor.n_workers)
+
+        grid = list(itertools.product(thresholds, penalities))
+        threshold = np.array([t for t, _ in grid])
+        penality = np.array([p for _, p in grid])
+
+    influence = []
+    with executor:
+        for method, kernel in zip(similarities, kernels):
+            ei.similarity_method = method
+            ei.kernel = kernel
+            with monitor.phase('similarity', similarity = method):
+                norms = eng.cube_norms(cube, kernel)
+            with monitor.phase('compute', similarity = method):
+                results = executor.map(sweep_job, (job_params(ei), cube, present, norms, i, j, step_ptr,
+                                                   t_old, t_new, weight, threshold, penality),
+                                       eindexes, costs, monitor)
+            influence.append(np.concatenate(results) if len(results) else np.zeros((0, len(grid))))
+
+    with monitor.phase('collect'):
+        u = edge_list.get_level_values(0).values
+        v = edge_list.get_level_values(1).values
+        edges, nodes = sweep_tables(ei, u, v, influence, similarities, grid, stats)
+    monitor.finish()
+    return edges, nodes
+
+#The job of the sweep for an individual worker, computed on its slice of edges: the similarities
+#of the steps of the slice are computed once, and the recurrence is run for all the pairs of
+#threshold and penality. In a static network the steps of the slice are built on the fly.
+#It returns the array of influences of shape (edges in the slice, pairs of parameters).
+def sweep_job(ei, cube, present, norms, node_i, node_j, step_ptr, t_old, t_new, weight,
+              threshold, penality, edges_slice_index):
+    first, last = edges_slice_index[0], edges_slice_index[1] + 1
+    if ei.dynamic:
+        steps = slice(step_ptr[first], step_ptr[last])
+        step_edge = np.repeat(np.arange(last - first), np.diff(step_ptr[first:last + 1]))
+        t_old = t_old[steps]
+        t_new = t_new[steps]
+        weight = weight[steps] if ei.balance else None
+    else:
+        n_steps = max(cube.shape[1] - 1, 0)
+        step_edge = np.repeat(np.arange(last - first), n_steps)
+        t_old = np.tile(np.arange(n_steps), last - first)
+        t_new = t_old + 1
+        weight = np.full(len(step_edge), float(cube.shape[1]))
+
+    i = node_i[first:last][step_edge]
+    j = node_j[first:last][step_edge]
+    sim_i, sim_j, sim_ij, valid = eng.step_similarities(cube, present, norms, i, j, t_old, t_new, ei.kernel)
+    return eng.influence_recurrence(last - first, step_edge, sim_i, sim_j, sim_ij, valid, weight,
+                                    threshold, ei.balance, penality)
+
+#Builds the tidy tables of the sweep from the influences of the edges, one array of shape
+#(edges, pairs of parameters) for every similarity method. The node influence of every
+#combination is aggregated as by NodeInfluence, on the signed node-edge incidence matrix.
+def sweep_tables(ei, u, v, influence, similarities, grid, stats):
+    n_edges = len(u)
+    #the signs of the incidence matrix, on which the influence of every combination is set
+    signs = eng.incidence_matrix(len(ei.nodes), u, v, np.ones(n_edges))
+    nodes = np.flatnonzero(np.diff(signs.indptr) > 0)
+    signs = signs[nodes]
+
+    edges_table = []
+    nodes_table = []
+    for method, inf in zip(similarities, influence):
+        for k, (threshold, penality) in enumerate(grid):
+            edges_table.append(pd.DataFrame({'similarity' : method, 'threshold' : threshold,
+                                             'penality' : penality,
+                                             ei.edgeu : ei.nodes.decode(u), ei.edgev : ei.nodes.decode(v),
+                                             'influence' : inf[:,k]}))
+
+            M = sparse.csr_matrix((signs.data * inf[signs.indices, k], signs.indices, signs.indptr),
+                                  shape = signs.shape)
+            node_inf, _, std, n_peaks = eng.incidence_aggregates(M, stats)
+            scores = pd.DataFrame({'similarity' : method, 'threshold' : threshold, 'penality' : penality,
+                                   'node' : ei.nodes.decode(nodes), 'influence' : node_inf})
+            if stats:
+                scores.loc[:,'n_peaks'] = n_peaks
+                scores.loc[:,'std'] = std
+            nodes_table.append(scores)
+
+    return pd.concat(edges_table, ignore_index = True), pd.concat(nodes_table, ignore_index = True)
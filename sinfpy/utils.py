@@ -8,16 +8,125 @@ from scipy.spatial import distance
 
 #Returns the similarity function as specified in the method
 #parameter, which can either be cosine (for cosine similarity), 
-#euclidean (for euclidean distance), or manhattan (for manhattan distance).
+#euclidean (for euclidean distance), manhattan (for manhattan distance),
+#or the name of any other registered similarity kernel (e.g. pearson or jaccard).
 def similarity_fun(method = 'cosine'):
     if method == 'euclidean':
         return lambda a,b : 1 - distance.euclidean(a,b)
     if method == 'manhattan':
-        return lambda a,b : 1 - distance.euclidean(a,b)
+        return lambda a,b : 1 - distance.cityblock(a,b)
     if method == 'cosine':
         return lambda a,b : np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
     else:
-        raise ValueError("Illegal value for method, no definition for " + method)
+        return similarity_kernel(method)
+
+#Dot product between the rows of two arrays of shape (n, d).
+#The products are summed column by column, so that the result for a row does not
+#depend on its position in the batch (and thus on how the edges are sliced).
+def rowdot(a, b):
+    dot = np.zeros(a.shape[0])
+    for k in range(a.shape[1]):
+        dot += a[:,k] * b[:,k]
+    return dot
+
+#Sum of the rows of an array of shape (n, d), column by column as rowdot.
+def rowsum(a):
+    total = np.zeros(a.shape[0])
+    for k in range(a.shape[1]):
+        total += a[:,k]
+    return total
+
+#Batched similarity kernel, which computes the similarity between the rows of two arrays
+#of shape (n, d). Kernels normalizing the vectors compute the norm of every row with norms:
+#the norms can be computed once (e.g. for every node at every timeframe) and passed to the
+#kernel, otherwise they are computed on every call.
+#A kernel can also be called on two vectors, and then returns a number, so that it can be
+#used as the similarity_fun of computing_influence.
+#New kernels define similarity (and norms, if they need them) and are registered by name
+#with register_similarity.
+class SimilarityKernel:
+    #Per-row norms of x, or None if the kernel does not use them.
+    def norms(self, x):
+        return None
+
+    def similarity(self, a, b, norm_a, norm_b):
+        raise NotImplementedError
+
+    def __call__(self, a, b, norm_a = None, norm_b = None):
+        single = np.ndim(a) == 1
+        a = np.atleast_2d(np.asarray(a, dtype = float))
+        b = np.atleast_2d(np.asarray(b, dtype = float))
+        norm_a = self.norms(a) if norm_a is None else norm_a
+        norm_b = self.norms(b) if norm_b is None else norm_b
+        sim = self.similarity(a, b, norm_a, norm_b)
+        return float(sim[0]) if single else sim
+
+#Cosine similarity.
+class CosineKernel(SimilarityKernel):
+    def norms(self, x):
+        return np.sqrt(rowdot(x, x))
+
+    def similarity(self, a, b, norm_a, norm_b):
+        return rowdot(a, b) / (norm_a * norm_b)
+
+#1 - the euclidean distance.
+class EuclideanKernel(SimilarityKernel):
+    def similarity(self, a, b, norm_a, norm_b):
+        return 1 - np.sqrt(rowdot(a - b, a - b))
+
+#1 - the manhattan distance.
+class ManhattanKernel(SimilarityKernel):
+    def similarity(self, a, b, norm_a, norm_b):
+        return 1 - rowsum(np.abs(a - b))
+
+#Pearson correlation between the properties of the two vectors. The norms are the ones of
+#the vectors centered on their mean.
+class PearsonKernel(SimilarityKernel):
+    def norms(self, x):
+        centered = x - (rowsum(x) / x.shape[1])[:,None]
+        return np.sqrt(rowdot(centered, centered))
+
+    def similarity(self, a, b, norm_a, norm_b):
+        a = a - (rowsum(a) / a.shape[1])[:,None]
+        b = b - (rowsum(b) / b.shape[1])[:,None]
+        return rowdot(a, b) / (norm_a * norm_b)
+
+#Weighted Jaccard similarity of non-negative vectors, sum(min(a, b)) / sum(max(a, b)),
+#which is the Jaccard similarity for binary vectors.
+class JaccardKernel(SimilarityKernel):
+    def similarity(self, a, b, norm_a, norm_b):
+        return rowsum(np.minimum(a, b)) / rowsum(np.maximum(a, b))
+
+#Kernel wrapping a function f(a, b) computing the similarity between the rows of two arrays.
+class FunctionKernel(SimilarityKernel):
+    def __init__(self, fun):
+        self.fun = fun
+
+    def similarity(self, a, b, norm_a, norm_b):
+        return np.asarray(self.fun(a, b), dtype = float)
+
+SIMILARITY_KERNELS = {'cosine' : CosineKernel(),
+                      'euclidean' : EuclideanKernel(),
+                      'manhattan' : ManhattanKernel(),
+                      'pearson' : PearsonKernel(),
+                      'jaccard' : JaccardKernel()}
+
+#Registers a similarity kernel under the given name, so that it can be used as the similarity
+#method of EdgeInfluence. kernel can either be a SimilarityKernel or a function f(a, b)
+#computing the similarity between the rows of two arrays of shape (n, d).
+#Kernels used with the processes or ray executors must be picklable.
+def register_similarity(name, kernel):
+    if not isinstance(kernel, SimilarityKernel):
+        if not callable(kernel):
+            raise TypeError('kernel should be a SimilarityKernel or a function.')
+        kernel = FunctionKernel(kernel)
+    SIMILARITY_KERNELS[name] = kernel
+
+#Returns the batched similarity kernel registered under the name specified in the method parameter.
+def similarity_kernel(method = 'cosine'):
+    if not method in SIMILARITY_KERNELS:
+        raise ValueError("Illegal value for method, no definition for " + str(method))
+    return SIMILARITY_KERNELS[method]
 
 #Computing the number of peaks of the attribute's values over time.
 #The argument is the vector of the attribute's values over time, cronologically ordered.
@@ -25,7 +134,14 @@ def number_of_peaks(x):
     return len(find_peaks(x)[0])
 
 #In case the parameter balance_inf is true, the influence value is adjusted according
-# to the edge's weight, using a logarithmic function
+# to the edge's weight, using a logarithmic function.
+#influence and weight can either be numbers or arrays of the same length, so that the
+#penality is applied to all the edges in one call.
 def balance_influence(influence, weight, penality = 0.1):
+    if np.ndim(influence) == 0 and np.ndim(weight) == 0:
+        penalized_inf = influence * penality
+        return float(influence - (penalized_inf * (1 - math.log(weight + 1, 2)/weight)))
+    influence = np.asarray(influence, dtype = float)
+    weight = np.asarray(weight, dtype = float)
     penalized_inf = influence * penality
-    return float(influence - (penalized_inf * (1 - math.log(weight + 1, 2)/weight)))
\ No newline at end of file
+    return influence - (penalized_inf * (1 - (np.log(weight + 1)/math.log(2))/weight))
\ No newline at end of file
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from sinfpy import engine as eng
+from sinfpy.semantic_influence import properties_similarity
+from sinfpy.utils import balance_influence
+
+#Influence over time ranges and rolling windows, answered from partials computed once.
+#The influence of an edge over a time range is the one computed by EdgeInfluence on the data
+#of the range only: its recurrence starts from 0 at the first step within the range. At every
+#step the recurrence of properties_similarity only depends on whether the previous influence
+#is above the threshold, so every step is a map from that state (False or True) to the new
+#influence: a fixed value, or the previous influence unchanged if the step is not valid.
+#Maps compose, so the maps of all the steps are computed once (with the similarities of the
+#steps) and kept in a segment tree over the steps of all the edges, sorted by edge and
+#chronologically: the map of any range of steps of every edge is obtained by composing
+#O(log(steps)) nodes of the tree, for all the edges at once.
+#In a static network the weight used by balance_inf is the number of timeframes in the range,
+#so with balance_inf a tree is built (once) for every length of the ranges queried.
+class InfluenceWindows:
+    #ei is the EdgeInfluence whose influence is queried, on the vectorized engine with the
+    #default computing_influence.
+    def __init__(self, ei):
+        if ei.engine != 'vectorized' or ei.computing_influence is not properties_similarity:
+            raise ValueError('Windows are supported by the vectorized engine with the default computing_influence.')
+        self.ei = ei
+
+        edge_list, args, _ = ei.vectorized_data()
+        _, cube, present, norms, i, j = args[:6]
+        self.edge_list = edge_list
+        self.u = edge_list.get_level_values(0).values
+        self.v = edge_list.get_level_values(1).values
+        n_edges = len(edge_list)
+
+        self.timeframes = np.unique(ei.X.loc[:,ei.timeframe].values.astype(float))
+        if ei.dynamic:
+            step_ptr, t_old, t_new, weight = args[6:]
+            edge, tf, _ = ei.edge_rows(edge_list)
+            step = np.flatnonzero(edge[1:] == edge[:-1]) + 1
+            #the timeframes of the rows and of the steps are ranked on the axis of the edges
+            self.axis = np.unique(tf)
+            self.row_key = edge * len(self.axis) + np.searchsorted(self.axis, tf)
+            self.old_key = self.row_key[step - 1]
+            self.new_key = self.row_key[step]
+        else:
+            n_steps = max(len(self.timeframes) - 1, 0)
+            step_ptr = np.arange(n_edges + 1) * n_steps
+            t_old = np.tile(np.arange(n_steps), n_edges)
+            t_new = t_old + 1
+            weight = None
+        step_edge = np.repeat(np.arange(n_edges), np.diff(step_ptr))
+
+        sim_i, sim_j, sim_ij, self.valid = eng.step_similarities(cube, present, norms, i[step_edge], j[step_edge],
+                                                                 t_old, t_new, ei.kernel)
+        self.change = ((sim_i <= ei.threshold) & (sim_j > ei.threshold)) | \
+                      ((sim_i > ei.threshold) & (sim_j <= ei.threshold))
+        self.influence = np.where(sim_i > sim_j, sim_ij, -sim_ij)
+        self.step_ptr = step_ptr
+        self.trees = {}
+        if ei.dynamic or not ei.balance:
+            self.trees[None] = self.tree(weight)
+
+    #Builds the segment tree of the maps of the steps, given the weight of every step.
+    #The maps are kept as two arrays of shape (tree node, state): the influence after the node,
+    #and whether the node leaves the previous influence unchanged.
+    def tree(self, weight):
+        n = len(self.valid)
+        size = 1 << max(n - 1, 0).bit_length()
+        value = np.zeros((2 * size, 2))
+        same = np.ones((2 * size, 2), dtype = bool)
+
+        for state in [False, True]:
+            inf = np.where(state | self.change, self.influence, 0.0)
+            if self.ei.balance:
+                inf = balance_influence(inf, weight, self.ei.penality)
+            value[size:size + n, int(state)] = inf
+            same[size:size + n, int(state)] = ~self.valid
+
+        level = size
+        while level > 1:
+            parents = np.arange(level // 2, level)
+            value[parents], same[parents] = self.compose(value[2 * parents], same[2 * parents],
+                                                         value[2 * parents + 1], same[2 * parents + 1])
+            level //= 2
+        return size, value, same
+
+    #Composes the maps f and g (f first), given as (value, same) arrays of shape (n, state).
+    def compose(self, f_value, f_same, g_value, g_same):
+        rows = np.arange(len(f_value))
+        value = np.empty_like(f_value)
+        same = np.empty_like(f_same)
+        for state in [0, 1]:
+            after = np.where(f_same[:,state], state, f_value[:,state] > self.ei.threshold).astype(int)
+            value[:,state] = np.where(g_same[rows, after], f_value[:,state], g_value[rows, after])
+            same[:,state] = f_same[:,state] & g_same[rows, after]
+        return value, same
+
+    #Composes the maps of the steps in [lo, hi) of every edge, and returns the influence after
+    #them, starting from 0.
+    def query(self, tree, lo, hi):
+        size, tree_value, tree_same = tree
+        n = len(lo)
+        left = (np.zeros((n, 2)), np.ones((n, 2), dtype = bool))
+        right = (np.zeros((n, 2)), np.ones((n, 2), dtype = bool))
+        lo = lo + size
+        hi = hi + size
+        while np.any(lo < hi):
+            k = np.flatnonzero((lo < hi) & (lo % 2 == 1))
+            value, same = self.compose(left[0][k], left[1][k], tree_value[lo[k]], tree_same[lo[k]])
+            left[0][k], left[1][k] = value, same
+            lo[k] += 1
+            k = np.flatnonzero((lo < hi) & (hi % 2 == 1))
+            hi[k] -= 1
+            value, same = self.compose(tree_value[hi[k]], tree_same[hi[k]], right[0][k], right[1][k])
+            right[0][k], right[1][k] = value, same
+            lo //= 2
+            hi //= 2
+        value, same = self.compose(left[0], left[1], right[0], right[1])
+
+        state = int(0.0 > self.ei.threshold)
+        return np.where(same[:,state], 0.0, value[:,state])
+
+    #The edges active in the time range and the range of their steps within it.
+    def steps(self, first, last):
+        edges = np.arange(len(self.edge_list))
+        if self.ei.dynamic:
+            n = len(self.axis)
+            start = edges * n + np.searchsorted(self.axis, first, side = 'left')
+            end = edges * n + np.searchsorted(self.axis, last, side = 'right')
+            active = np.searchsorted(self.row_key, end) > np.searchsorted(self.row_key, start)
+            lo = np.searchsorted(self.old_key, start)
+            hi = np.maximum(np.searchsorted(self.new_key, end), lo)
+            return active, lo, hi, None
+
+        #all the edges step through the timeframes of the range
+        start = np.searchsorted(self.timeframes, first, side = 'left')
+        end = np.searchsorted(self.timeframes, last, side = 'right')
+        lo = self.step_ptr[:-1] + start
+        hi = self.step_ptr[:-1] + max(end - 1, start)
+        return np.ones(len(edges), dtype = bool), lo, hi, max(end - start, 0)
+
+    #Influence of the edges over time_range, given as (first, last) with both ends included
+    #(None for no bound). It returns the codes of the two nodes of the edges active in the
+    #range (all the edges, in a static network) and their influence.
+    def edge_influence(self, time_range):
+        first, last = (None, None) if time_range is None else time_range
+        first = -np.inf if first is None else float(first)
+        last = np.inf if last is None else float(last)
+
+        active, lo, hi, n_tf = self.steps(first, last)
+        key = n_tf if not self.ei.dynamic and self.ei.balance else None
+        if not key in self.trees:
+            self.trees[key] = self.tree(np.full(len(self.valid), float(key)))
+        influence = self.query(self.trees[key], lo[active], hi[active])
+        return self.u[active], self.v[active], influence
+
+    #Returns the table of edges with their influence over time_range, as returned by EdgeInfluence
+    #called on the edges and properties within the range.
+    def edges(self, time_range = None):
+        u, v, influence = self.edge_influence(time_range)
+        ei = self.ei
+        #the edges are returned in the order of their ids, as when EdgeInfluence is called
+        order = np.lexsort((ei.nodes.keys[v], ei.nodes.keys[u]))
+        return pd.DataFrame({ei.edgeu : ei.nodes.decode(u[order]), ei.edgev : ei.nodes.decode(v[order]),
+                             'influence' : influence[order]})
+
+    #Returns the table of node influence scores over time_range, as returned by NodeInfluence
+    #on the edges of the range. stats is as for NodeInfluence.
+    def nodes(self, time_range = None, stats = False):
+        u, v, influence = self.edge_influence(time_range)
+        M = eng.incidence_matrix(len(self.ei.nodes), u, v, influence)
+        nodes = np.flatnonzero(np.diff(M.indptr) > 0)
+        influence, _, std, n_peaks = eng.incidence_aggregates(M[nodes], stats)
+
+        influence_scores = pd.DataFrame({'node': self.ei.nodes.decode(nodes), 'influence': influence})
+        if stats:
+            influence_scores.loc[:,'n_peaks'] = n_peaks
+            influence_scores.loc[:,'std'] = std
+        return influence_scores
+
+    #Node influence scores over rolling windows of the last window timeframes (on the sorted
+    #timeframes of the properties), ending at every timeframe in ends (by default all of them).
+    #It returns a tidy table with the last timeframe of the window, the node and its scores.
+    def rolling(self, window, stats = False, ends = None):
+        ends = self.timeframes if ends is None else np.asarray(ends, dtype = float)
+        tables = []
+        for end in ends:
+            k = np.searchsorted(self.timeframes, end, side = 'right')
+            first = self.timeframes[max(k - window, 0)] if k > 0 else end
+            scores = self.nodes((first, end), stats)
+            scores.insert(0, self.ei.timeframe, end)
+            tables.append(scores)
+        if len(tables) == 0:
+            return pd.DataFrame(columns = [self.ei.timeframe, 'node', 'influence'])
+        return pd.concat(tables, ignore_index = True)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+import sinfpy.semantic_influence as sinf
+from sinfpy.checkpoint import Checkpoint
+
+from test_engines import random_graph
+
+def chunk_files(path):
+    return sorted(f for f in os.listdir(path) if f.startswith('chunk-'))
+
+#A computation stopped before its end is resumed from the completed chunks, computing only the
+#missing ones, and gives the result of an uninterrupted run.
+@pytest.mark.parametrize('engine', ['pandas', 'vectorized'])
+def test_resume(tmp_path, engine):
+    E, X = random_graph()
+    expected = sinf.EdgeInfluence(E, X, engine = engine)(executor = 'serial')
+    expected_nodes = sinf.NodeInfluence(expected, stats = True)(executor = 'serial')
+
+    ei = sinf.EdgeInfluence(E, X, engine = engine)
+    ei(n_workers = 2, executor = 'serial', checkpoint = tmp_path)
+    files = chunk_files(tmp_path / 'EdgeInfluence')
+    assert len(files) > 2
+    #the run stopped before its end
+    for f in files[1::2]:
+        os.remove(tmp_path / 'EdgeInfluence' / f)
+
+    ei = sinf.EdgeInfluence(E, X, engine = engine)
+    resumed = ei(n_workers = 4, executor = 'serial', checkpoint = tmp_path)
+    assert len(ei.workers_report) > 0 and ei.workers_report.chunks.sum() == len(files[1::2])
+    assert resumed.equals(expected)
+    assert chunk_files(tmp_path / 'EdgeInfluence') == files
+
+    nodes = sinf.NodeInfluence(resumed, stats = True)(executor = 'serial', checkpoint = tmp_path)
+    assert nodes.equals(expected_nodes)
+    assert sinf.NodeInfluence(resumed, stats = True)(executor = 'serial', checkpoint = tmp_path).equals(nodes)
+
+#A checkpoint made with different data or parameters is not mixed with the new computation.
+def test_fingerprint(tmp_path):
+    E, X = random_graph()
+    sinf.EdgeInfluence(E, X)(executor = 'serial', checkpoint = tmp_path)
+    with pytest.raises(ValueError):
+        sinf.EdgeInfluence(E, X, threshold = 0.5)(executor = 'serial', checkpoint = tmp_path)
+    X.loc[0, 'a'] += 1
+    with pytest.raises(ValueError):
+        sinf.EdgeInfluence(E, X)(executor = 'serial', checkpoint = tmp_path)
+
+    #with overwrite the checkpoint is deleted and the computation starts over
+    expected = sinf.EdgeInfluence(E, X, threshold = 0.5)(executor = 'serial')
+    result = sinf.EdgeInfluence(E, X, threshold = 0.5)(executor = 'serial',
+                                                       checkpoint = Checkpoint(tmp_path, overwrite = True))
+    assert result.equals(expected)
+    assert sinf.EdgeInfluence(E, X, threshold = 0.5)(executor = 'serial', checkpoint = tmp_path).equals(expected)
+
+#clear deletes the files of the checkpoints, leaving the other files of the directory.
+def test_clear(tmp_path):
+    E, X = random_graph()
+    updated_E = sinf.EdgeInfluence(E, X)(executor = 'serial', checkpoint = tmp_path)
+    sinf.NodeInfluence(updated_E)(executor = 'serial', checkpoint = tmp_path)
+    (tmp_path / 'notes.txt').write_text('kept')
+    checkpoint = Checkpoint(tmp_path)
+
+    checkpoint.clear('NodeInfluence')
+    assert sorted(os.listdir(tmp_path)) == ['EdgeInfluence', 'notes.txt']
+    checkpoint.clear()
+    assert os.listdir(tmp_path) == ['notes.txt']
+    checkpoint.clear()
+    Checkpoint(tmp_path / 'missing').clear()
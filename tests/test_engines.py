@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import sinfpy.semantic_influence as sinf
+
+#A random time-evolving graph with node ids which are not their codes.
+def random_graph(seed = 0, n_nodes = 30, n_edges = 150, n_timeframes = 6, string_ids = False):
+    rng = np.random.default_rng(seed)
+    ids = 100 + 7 * np.arange(n_nodes)
+    X = pd.DataFrame({'characterId' : np.repeat(ids, n_timeframes),
+                      'a' : rng.random(n_nodes * n_timeframes),
+                      'b' : rng.random(n_nodes * n_timeframes),
+                      'c' : rng.random(n_nodes * n_timeframes),
+                      'timeframe' : np.tile(np.arange(1, n_timeframes + 1), n_nodes)})
+    pairs = pd.DataFrame(rng.choice(ids, (n_edges, 2)), columns = ['p1', 'p2'])
+    pairs = pairs[pairs.p1 != pairs.p2].drop_duplicates()
+    E = pd.concat([pairs.assign(timeframe = float(tf), weight = float(rng.integers(1, 6)))
+                   for tf in range(1, n_timeframes + 1)], ignore_index = True)
+    E = E.sample(frac = 0.7, random_state = seed).sort_values(['p1', 'p2', 'timeframe'])
+    if string_ids:
+        X['characterId'] = 'n' + X.characterId.astype(str)
+        E['p1'] = 'n' + E.p1.astype(str)
+        E['p2'] = 'n' + E.p2.astype(str)
+    return E.reset_index(drop = True), X
+
+#The pandas and vectorized engines return the same influence with the default function, also
+#when nodes have no properties at some timeframes, whose steps leave the influence unchanged.
+@pytest.mark.parametrize('dynamic', [True, False])
+@pytest.mark.parametrize('string_ids', [False, True])
+@pytest.mark.parametrize('missing', [False, True])
+def test_engines_agree(dynamic, string_ids, missing):
+    E, X = random_graph(string_ids = string_ids)
+    if missing:
+        X = X.sample(frac = 0.8, random_state = 1)
+    if not dynamic:
+        E = E.drop_duplicates(['p1', 'p2']).loc[:,['p1', 'p2']]
+    results = [sinf.EdgeInfluence(E, X, dynamic = dynamic, threshold = 0.5,
+                                  engine = engine)(executor = 'serial')
+               for engine in ['pandas', 'vectorized']]
+    assert (results[0].loc[:,['p1', 'p2']].values == results[1].loc[:,['p1', 'p2']].values).all()
+    np.testing.assert_allclose(results[0].influence.values, results[1].influence.values, atol = 1e-12)
+
+#Single-edge functions receive the same tables, with the selected columns only, on both engines.
+def test_single_edge_tables():
+    E, X = random_graph(n_nodes = 6, n_edges = 10)
+    seen = {}
+
+    def influence(xi_old, xi_new, xj_old, xj_new, threshold, prev_inf, similarity):
+        seen.setdefault('columns', set()).add(tuple(xi_new.columns))
+        return float(xi_new.iloc[0]['a'] - xj_new.iloc[0]['a'])
+
+    results = [sinf.EdgeInfluence(E, X, computing_influence = influence, balance_inf = False,
+                                  columns = ['a', 'b'], engine = engine)(executor = 'serial')
+               for engine in ['pandas', 'vectorized']]
+    assert seen['columns'] == {('a', 'b')}
+    np.testing.assert_allclose(results[0].influence.values, results[1].influence.values)
+
+#The stats updated by NodeInfluence.update are those of the node influence recomputed from scratch,
+#including the standard deviation of the nodes whose edges all have the same influence.
+def test_node_update_stats():
+    E = pd.DataFrame({'p1' : [1, 1, 1, 2], 'p2' : [2, 3, 4, 3], 'influence' : [0.3, 0.3, 0.3, 0.1]})
+    node_influence = sinf.NodeInfluence(E, stats = True)
+    node_influence(executor = 'serial')
+    E.loc[3, 'influence'] = 0.7
+    E = pd.concat([E, pd.DataFrame({'p1' : [1], 'p2' : [5], 'influence' : [0.3]})], ignore_index = True)
+    updated = node_influence.update(E)
+    expected = sinf.NodeInfluence(E, stats = True)(executor = 'serial')
+    assert (updated.node.values == expected.node.values).all()
+    assert (updated.loc[:,['n_peaks', 'std']].values == expected.loc[:,['n_peaks', 'std']].values).all()
+    assert updated.loc[updated.node == 1, 'std'].item() == 0
+
+#The tables of the caller are left unchanged, so that they can be used again (e.g. by retention_transfer).
+@pytest.mark.parametrize('engine', ['pandas', 'vectorized'])
+def test_tables_unchanged(engine):
+    E, X = random_graph(string_ids = True)
+    E_before, X_before = E.copy(), X.copy()
+    ei = sinf.EdgeInfluence(E, X, engine = engine)
+    pd.testing.assert_frame_equal(E, E_before)
+    pd.testing.assert_frame_equal(X, X_before)
+    updated_E = ei(executor = 'serial')
+    sinf.NodeInfluence(updated_E, stats = True)(executor = 'serial')
+    sinf.SemanticInfluence(E, X, stats = True, engine = engine)(executor = 'serial')
+    pd.testing.assert_frame_equal(E, E_before)
+    pd.testing.assert_frame_equal(X, X_before)
+
+#The edges missing from the table given to NodeInfluence.update are removed from the scores of their
+#nodes, and the nodes left without edges are dropped.
+def test_node_update_removed_edges():
+    E = pd.DataFrame({'p1' : [1, 1, 1, 2, 4], 'p2' : [2, 3, 4, 3, 5],
+                      'influence' : [0.3, -0.2, 0.5, 0.1, 0.4]})
+    node_influence = sinf.NodeInfluence(E, stats = True)
+    node_influence(executor = 'serial')
+    E = E.iloc[[0, 1, 3]].copy()
+    E.loc[1, 'influence'] = 0.6
+    updated = node_influence.update(E).sort_values('node', ignore_index = True)
+    expected = sinf.NodeInfluence(E, stats = True)(executor = 'serial')
+    assert (updated.node.values == expected.node.values).all()
+    np.testing.assert_allclose(updated.influence.values, expected.influence.values, rtol = 0, atol = 1e-15)
+    assert (updated.loc[:,['n_peaks', 'std']].values == expected.loc[:,['n_peaks', 'std']].values).all()
+
+#EdgeInfluence.update with new timeframes, bringing new nodes and edges, gives the influence of a full
+#computation over the whole history.
+@pytest.mark.parametrize('balance_inf', [True, False])
+@pytest.mark.parametrize('string_ids', [False, True])
+def test_edge_update(balance_inf, string_ids):
+    E, X = random_graph(string_ids = string_ids)
+    #the last nodes only appear in the new timeframes
+    late = X.characterId.unique()[-5:]
+    E = E[~((E.p1.isin(late) | E.p2.isin(late)) & (E.timeframe <= 4))].reset_index(drop = True)
+    X = X[~(X.characterId.isin(late) & (X.timeframe <= 4))].reset_index(drop = True)
+    expected = sinf.EdgeInfluence(E, X, balance_inf = balance_inf)(executor = 'serial')
+
+    ei = sinf.EdgeInfluence(E[E.timeframe <= 4], X[X.timeframe <= 4], balance_inf = balance_inf)
+    ei(executor = 'serial')
+    n_nodes = len(ei.nodes)
+    ei.update(E[E.timeframe == 5], X[X.timeframe == 5])
+    updated = ei.update(E[E.timeframe == 6], X[X.timeframe == 6])
+    assert len(ei.nodes) == n_nodes + len(late)
+    assert (updated.influence != 0).any()
+    assert (updated.loc[:,['p1', 'p2']].values == expected.loc[:,['p1', 'p2']].values).all()
+    np.testing.assert_allclose(updated.influence.values, expected.influence.values, rtol = 0, atol = 1e-12)
+
+#Static networks cannot be updated: their influence is balanced by the number of timeframes of X.
+def test_static_edge_update():
+    E, X = random_graph()
+    E = E.drop_duplicates(['p1', 'p2']).loc[:,['p1', 'p2']]
+    ei = sinf.EdgeInfluence(E, X[X.timeframe <= 4], dynamic = False)
+    ei(executor = 'serial')
+    with pytest.raises(ValueError):
+        ei.update(E, X[X.timeframe == 5])
+
+#The sparse and pandas engines of NodeInfluence return the same scores: the standard deviation may
+#differ in the last digits.
+@pytest.mark.parametrize('string_ids', [False, True])
+def test_node_engines_agree(string_ids):
+    E, X = random_graph(string_ids = string_ids)
+    updated_E = sinf.EdgeInfluence(E, X, threshold = 0.5)(executor = 'serial')
+    #a self loop counts once
+    loop = updated_E.iloc[[0]].assign(p2 = updated_E.p1.iloc[0])
+    updated_E = pd.concat([updated_E, loop], ignore_index = True)
+    results = [sinf.NodeInfluence(updated_E, stats = True, engine = engine)(executor = 'serial')
+               for engine in ['pandas', 'sparse']]
+    assert list(results[0].columns) == list(results[1].columns)
+    for column in ['node', 'influence', 'n_peaks']:
+        assert (results[0].loc[:,column].values == results[1].loc[:,column].values).all()
+    np.testing.assert_allclose(results[0].loc[:,'std'].values, results[1].loc[:,'std'].values, rtol = 0, atol = 1e-14)
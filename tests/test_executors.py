@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pytest
+
+import sinfpy.semantic_influence as sinf
+from sinfpy import executors as exe
+
+from test_engines import random_graph
+
+#A job summing the slice of an array, also within a dict, scaled by a plain argument.
+def slice_job(values, columns, scale, task):
+    rows = slice(task[0], task[1] + 1)
+    return scale * (values[rows].sum() + columns['b'][rows].sum())
+
+#The built-in executors return the same results, in the order of the tasks.
+@pytest.mark.parametrize('executor', ['threads', 'processes'])
+def test_executors_agree(executor):
+    E, X = random_graph()
+    expected_E = sinf.EdgeInfluence(E, X, threshold = 0.5)(executor = 'serial')
+    expected_pandas = sinf.EdgeInfluence(E, X, threshold = 0.5, engine = 'pandas')(executor = 'serial')
+    expected_nodes = sinf.NodeInfluence(expected_E, stats = True)(executor = 'serial')
+
+    updated_E = sinf.EdgeInfluence(E, X, threshold = 0.5)(n_workers = 3, executor = executor)
+    pandas_E = sinf.EdgeInfluence(E, X, threshold = 0.5, engine = 'pandas')(n_workers = 3, executor = executor)
+    nodes = sinf.NodeInfluence(updated_E, stats = True)(n_workers = 3, executor = executor)
+    assert updated_E.equals(expected_E)
+    assert pandas_E.equals(expected_pandas)
+    assert nodes.equals(expected_nodes)
+
+#The arrays shared with the processes, also within dicts, are read by the workers and the shared
+#memory blocks are released once the map is completed.
+def test_process_shared_memory():
+    values = np.arange(100, dtype = float)
+    columns = {'b' : np.ones(100), 'name' : 'b'}
+    tasks, costs = exe.balanced_chunks(np.ones(100), 2)
+    shm = set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+    executor = exe.get_executor('processes', 2)
+    results = executor.map(slice_job, (values, columns, 2.0), tasks, costs)
+    expected = exe.get_executor('serial').map(slice_job, (values, columns, 2.0), tasks, costs)
+    assert results == expected
+    assert sum(results) == 2.0 * (values.sum() + 100)
+    assert [t['task'] for t in sorted(executor.timings, key = lambda t : t['task'])] == list(range(len(tasks)))
+    if os.path.isdir('/dev/shm'):
+        assert set(os.listdir('/dev/shm')) <= shm
+
+#The chunks cover all the items in order, without empty chunks, with the sum of their costs.
+def check_chunks(cost, chunks, costs):
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(cost) - 1
+    for (first, last), (following, _) in zip(chunks[:-1], chunks[1:]):
+        assert following == last + 1
+    for (first, last), chunk_cost in zip(chunks, costs):
+        assert first <= last
+        assert chunk_cost == pytest.approx(np.sum(cost[first:last + 1]))
+
+def test_balanced_chunks():
+    assert exe.balanced_chunks([], 4) == ([], [])
+
+    #fewer items than chunks: one chunk per item
+    cost = np.array([1.0, 2.0, 3.0])
+    chunks, costs = exe.balanced_chunks(cost, 4)
+    check_chunks(cost, chunks, costs)
+    assert chunks == [[0, 0], [1, 1], [2, 2]]
+
+    #a very costly item is in a chunk of its own, and the others are still split
+    cost = np.ones(100)
+    cost[40] = 1e6
+    chunks, costs = exe.balanced_chunks(cost, 2)
+    check_chunks(cost, chunks, costs)
+    assert [40, 40] in chunks
+    assert len(chunks) > 2
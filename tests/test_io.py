@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import sinfpy.semantic_influence as sinf
+from sinfpy import io
+
+from test_engines import random_graph
+
+#The edge and node influence computed at once over the whole history.
+def full_influence(E, X, **params):
+    updated_E = sinf.EdgeInfluence(E, X, **params)(executor = 'serial')
+    return updated_E, sinf.NodeInfluence(updated_E, stats = True)(executor = 'serial')
+
+def assert_same_influence(result, expected):
+    updated_E, influences = result
+    expected_E, expected_nodes = expected
+    assert (updated_E.loc[:,['p1', 'p2']].values == expected_E.loc[:,['p1', 'p2']].values).all()
+    np.testing.assert_allclose(updated_E.influence.values, expected_E.influence.values, rtol = 0, atol = 1e-12)
+    #new nodes are appended by the updates
+    influences = influences.sort_values('node', ignore_index = True)
+    assert (influences.node.values == expected_nodes.node.values).all()
+    np.testing.assert_allclose(influences.loc[:,['influence', 'std']].values,
+                               expected_nodes.loc[:,['influence', 'std']].values, rtol = 0, atol = 1e-12)
+    assert (influences.n_peaks.values == expected_nodes.n_peaks.values).all()
+
+#The influence of the edges active in every timeframe, as written by the streaming functions.
+def timeframe_influence(E, X, **params):
+    tables = []
+    for tf in np.sort(E.timeframe.unique()):
+        updated_E = sinf.EdgeInfluence(E[E.timeframe <= tf], X[X.timeframe <= tf], **params)(executor = 'serial')
+        active = E.loc[E.timeframe == tf, ['p1', 'p2']].drop_duplicates()
+        tables.append(updated_E.merge(active).assign(timeframe = tf))
+    return pd.concat(tables, ignore_index = True)
+
+#A HDFStore with the edges and properties of every timeframe N as edgelist_tfN and X_tfN.
+def write_hdf(path, E, X):
+    with pd.HDFStore(path, mode = 'w') as hdf:
+        for tf in np.sort(E.timeframe.unique()):
+            hdf.put('edgelist_tf%d' % tf, E[E.timeframe == tf].set_index(['p1', 'p2']))
+            hdf.put('X_tf%d' % tf, X[X.timeframe == tf])
+
+def test_stream_hdf(tmp_path):
+    pytest.importorskip('tables')
+    E, X = random_graph()
+    path = str(tmp_path / 'graph.h5')
+    write_hdf(path, E, X)
+
+    E_read, X_read = io.read_hdf(path)
+    pd.testing.assert_frame_equal(E_read.sort_values(['p1', 'p2', 'timeframe'], ignore_index = True), E)
+    pd.testing.assert_frame_equal(X_read.sort_values(['characterId', 'timeframe'], ignore_index = True),
+                                  X.sort_values(['characterId', 'timeframe'], ignore_index = True))
+
+    expected = full_influence(E, X)
+    assert_same_influence(io.stream_influence(path, str(tmp_path / 'out.h5'), stats = True), expected)
+    with pd.HDFStore(str(tmp_path / 'out.h5'), mode = 'r') as hdf:
+        edges = hdf['edges']
+        nodes = hdf['nodes']
+    expected_edges = timeframe_influence(E, X)
+    edges = edges.sort_values(['timeframe', 'p1', 'p2'], ignore_index = True)
+    expected_edges = expected_edges.sort_values(['timeframe', 'p1', 'p2'], ignore_index = True)
+    assert (edges.loc[:,['p1', 'p2', 'timeframe']].values == expected_edges.loc[:,['p1', 'p2', 'timeframe']].values).all()
+    np.testing.assert_allclose(edges.influence.values, expected_edges.influence.values, rtol = 0, atol = 1e-12)
+    assert len(nodes) == len(expected[1])
+
+def test_parquet(tmp_path):
+    ds = pytest.importorskip('pyarrow.dataset')
+    E, X = random_graph()
+    io.write_parquet(E, str(tmp_path / 'edges'))
+    io.write_parquet(X, str(tmp_path / 'data'))
+
+    #the projection and the filters give the selected columns and rows
+    nodes = X.characterId.unique()[:10]
+    E_read, X_read = io.read_parquet(str(tmp_path / 'edges'), str(tmp_path / 'data'), columns = ['a'],
+                                     timeframes = (2, 4), nodes = nodes)
+    selected = E[E.timeframe.between(2, 4) & E.p1.isin(nodes) & E.p2.isin(nodes)]
+    assert list(X_read.columns) == ['characterId', 'timeframe', 'a']
+    assert (E_read.loc[:,['p1', 'p2', 'timeframe']].values == selected.loc[:,['p1', 'p2', 'timeframe']].values).all()
+    assert len(X_read) == (X.timeframe.between(2, 4) & X.characterId.isin(nodes)).sum()
+    assert list(io.parquet_timeframes(str(tmp_path / 'edges'), (2, None))) == [2, 3, 4, 5, 6]
+
+    expected = full_influence(E, X)
+    result = io.stream_parquet_influence(str(tmp_path / 'edges'), str(tmp_path / 'data'), str(tmp_path / 'out'),
+                                         stats = True)
+    assert_same_influence(result, expected)
+    edges = ds.dataset(str(tmp_path / 'out' / 'edges'), partitioning = 'hive').to_table().to_pandas()
+    edges = edges.sort_values(['p1', 'p2', 'timeframe'], ignore_index = True)
+    assert len(ds.dataset(str(tmp_path / 'out' / 'nodes')).to_table()) == len(expected[1])
+    expected_edges = timeframe_influence(E, X).sort_values(['p1', 'p2', 'timeframe'], ignore_index = True)
+    assert (edges.loc[:,['p1', 'p2', 'timeframe']].values == expected_edges.loc[:,['p1', 'p2', 'timeframe']].values).all()
+    np.testing.assert_allclose(edges.influence.values, expected_edges.influence.values, rtol = 0, atol = 1e-12)
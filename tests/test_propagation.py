@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import sinfpy.semantic_influence as sinf
+from sinfpy.propagation import InfluencePropagation
+
+from test_engines import random_graph
+
+#The signed adjacency matrix of the edges, dense, and the ids of its rows.
+def dense_adjacency(E):
+    ids = np.unique(np.r_[E.p1.values, E.p2.values])
+    u = np.searchsorted(ids, E.p1.values)
+    v = np.searchsorted(ids, E.p2.values)
+    P = np.zeros((len(ids), len(ids)))
+    np.add.at(P, (u, v), E.influence.values)
+    loop = u == v
+    np.add.at(P, (v[~loop], u[~loop]), -E.influence.values[~loop])
+    degree = np.bincount(np.r_[u, v[~loop]], minlength = len(ids))
+    return P / degree[:,None], ids
+
+def updated_edges():
+    E, X = random_graph()
+    updated_E = sinf.EdgeInfluence(E, X, threshold = 0.5)(executor = 'serial')
+    #a self loop counts once
+    loop = updated_E.iloc[[0]].assign(p2 = updated_E.p1.iloc[0])
+    return pd.concat([updated_E, loop], ignore_index = True)
+
+#The propagated influence is the solution of x = P·1 + damping·P·x, and its first hop the node
+#influence score.
+@pytest.mark.parametrize('n_workers', [None, 3])
+def test_propagation(n_workers):
+    updated_E = updated_edges()
+    P, ids = dense_adjacency(updated_E)
+    ones = np.ones(len(ids))
+    propagation = InfluencePropagation(updated_E, damping = 0.8, tol = 1e-12)
+    scores = propagation(n_workers = n_workers)
+
+    assert propagation.converged
+    assert (scores.node.values == ids).all()
+    np.testing.assert_allclose(scores.propagated.values, np.linalg.solve(np.eye(len(ids)) - 0.8 * P, P.dot(ones)),
+                               rtol = 0, atol = 1e-10)
+    nodes = sinf.NodeInfluence(updated_E)(executor = 'serial')
+    assert (nodes.node.values == ids).all()
+    np.testing.assert_allclose(scores.influence.values, nodes.influence.values, rtol = 0, atol = 1e-15)
+
+#With hops only the walks up to that many hops are summed.
+def test_hops():
+    updated_E = updated_edges()
+    P, ids = dense_adjacency(updated_E)
+    walk = P.dot(np.ones(len(ids)))
+    expected = walk.copy()
+    for hops in range(1, 5):
+        scores = InfluencePropagation(updated_E, damping = 1.0, hops = hops)()
+        np.testing.assert_allclose(scores.propagated.values, expected, rtol = 0, atol = 1e-12)
+        walk = P.dot(walk)
+        expected = expected + walk
+
+#Diverging iterations stop early with a warning.
+def test_divergence():
+    E = pd.DataFrame({'p1' : [1, 1], 'p2' : [2, 3], 'influence' : [20.0, 10.0]})
+    propagation = InfluencePropagation(E, damping = 0.9, max_iter = 1000)
+    with pytest.warns(RuntimeWarning):
+        propagation()
+    assert not propagation.converged
+    assert propagation.iterations < 1000
+
+#Invalid parameters and tables raise a ValueError.
+def test_parameters():
+    E = pd.DataFrame({'p1' : [1], 'p2' : [2], 'influence' : [0.5]})
+    for params in [{'damping' : 0}, {'damping' : 1.0}, {'hops' : 0}, {'hops' : 1.5}]:
+        with pytest.raises(ValueError):
+            InfluencePropagation(E, **params)
+    with pytest.raises(ValueError):
+        InfluencePropagation(E.drop(columns = 'influence'))
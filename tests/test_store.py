@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from sinfpy.store import write_store, InfluenceStore
+
+#A table of edges with their influence at every timeframe, with distinct influences so that
+#the top-k are well defined.
+def timeframe_edges(seed = 0, n_nodes = 20, n_rows = 300, string_ids = False):
+    rng = np.random.default_rng(seed)
+    ids = 100 + 7 * np.arange(n_nodes)
+    edges = pd.DataFrame({'p1' : rng.choice(ids, n_rows), 'p2' : rng.choice(ids, n_rows),
+                          'influence' : rng.uniform(-1, 1, n_rows),
+                          'timeframe' : rng.integers(1, 8, n_rows).astype(float)})
+    if string_ids:
+        edges['p1'] = 'n' + edges.p1.astype(str)
+        edges['p2'] = 'n' + edges.p2.astype(str)
+    return edges
+
+def in_range(table, time_range):
+    first, last = time_range
+    return table[table.timeframe.between(-np.inf if first is None else first, np.inf if last is None else last)]
+
+def same_rows(result, expected):
+    expected = expected.reset_index(drop = True)
+    assert list(result.columns) == list(expected.columns)
+    assert (result.values == expected.values).all()
+
+#The queries of the store return the rows selected by filtering and sorting the whole tables.
+@pytest.mark.parametrize('string_ids', [False, True])
+def test_queries(tmp_path, string_ids):
+    edges = timeframe_edges(string_ids = string_ids)
+    nodes = pd.DataFrame({'node' : np.unique(np.r_[edges.p1, edges.p2])})
+    nodes['influence'] = np.linspace(-1, 1, len(nodes))[::-1]
+    write_store(str(tmp_path), edges = edges, nodes = nodes)
+    store = InfluenceStore(str(tmp_path))
+
+    assert list(store.timeframes('edges')) == sorted(edges.timeframe.unique())
+    for time_range in [(None, None), (2, 5), (3, 3), (6, None), (8, 9)]:
+        selected = in_range(edges, time_range)
+        same_rows(store.range('edges', time_range).sort_values(['timeframe', 'influence']),
+                  selected.sort_values(['timeframe', 'influence']))
+        for k in [1, 10, 1000]:
+            same_rows(store.top('edges', k, time_range), selected.nlargest(k, 'influence'))
+            same_rows(store.top('edges', k, time_range, ascending = True), selected.nsmallest(k, 'influence'))
+            top = store.top('edges', k, time_range, absolute = True)
+            same_rows(top, selected.iloc[np.argsort(-selected.influence.abs().values, kind = 'stable')[:k]])
+
+        for node in [edges.p1.iloc[0], edges.p2.iloc[-1]]:
+            node_rows = selected[(selected.p1 == node) | (selected.p2 == node)]
+            same_rows(store.node(node, time_range = time_range).sort_values(['timeframe', 'influence']),
+                      node_rows.sort_values(['timeframe', 'influence']))
+            same_rows(store.node(node, time_range = time_range, sort = 'influence'),
+                      node_rows.sort_values('influence', ascending = False))
+
+    #the table of nodes has no timeframes
+    same_rows(store.top('nodes', 5), nodes.nlargest(5, 'influence'))
+    same_rows(store.node(nodes.node.iloc[3], 'nodes'), nodes.iloc[[3]])
+    assert len(store.node('missing' if string_ids else -1)) == 0
+    with pytest.raises(ValueError):
+        store.node(nodes.node.iloc[0], sort = 'time')
+
+#Writing a store again replaces its tables.
+def test_rewrite(tmp_path):
+    edges = timeframe_edges()
+    write_store(str(tmp_path), edges = edges)
+    store = write_store(str(tmp_path), edges = edges.iloc[:10])
+    same_rows(store.top('edges', 100), edges.iloc[:10].nlargest(100, 'influence'))
+    with pytest.raises(ValueError):
+        store.top('nodes')
+    with pytest.raises(ValueError):
+        write_store(str(tmp_path), edges = edges.drop(columns = 'influence'))
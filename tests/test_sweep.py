@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import sinfpy.semantic_influence as sinf
+from sinfpy.sweep import influence_sweep
+
+from test_engines import random_graph
+
+#Every combination of the sweep gives the edge and node influence of a separate computation
+#with its parameters.
+@pytest.mark.parametrize('dynamic', [True, False])
+def test_sweep(dynamic):
+    E, X = random_graph()
+    if not dynamic:
+        E = E.drop_duplicates(['p1', 'p2']).loc[:,['p1', 'p2']]
+    thresholds = [0.5, 0.8]
+    penalities = [0.05, 0.1]
+    similarities = ['cosine', 'euclidean']
+    edges, nodes = influence_sweep(E, X, thresholds = thresholds, penalities = penalities,
+                                   similarities = similarities, stats = True, dynamic = dynamic,
+                                   executor = 'serial')
+    assert len(edges.groupby(['similarity', 'threshold', 'penality'])) == 8
+
+    for similarity in similarities:
+        for threshold in thresholds:
+            for penality in penalities:
+                params = dict(similarity = similarity, threshold = threshold, penality = penality, dynamic = dynamic)
+                expected_E = sinf.EdgeInfluence(E, X, **params)(executor = 'serial')
+                expected_nodes = sinf.NodeInfluence(expected_E, stats = True)(executor = 'serial')
+                combination = (edges.similarity == similarity) & (edges.threshold == threshold) & \
+                              (edges.penality == penality)
+                swept_E = edges[combination]
+                assert (swept_E.loc[:,['p1', 'p2']].values == expected_E.loc[:,['p1', 'p2']].values).all()
+                np.testing.assert_allclose(swept_E.influence.values, expected_E.influence.values,
+                                           rtol = 0, atol = 1e-12)
+
+                combination = (nodes.similarity == similarity) & (nodes.threshold == threshold) & \
+                              (nodes.penality == penality)
+                swept_nodes = nodes[combination]
+                assert (swept_nodes.node.values == expected_nodes.node.values).all()
+                assert (swept_nodes.n_peaks.values == expected_nodes.n_peaks.values).all()
+                np.testing.assert_allclose(swept_nodes.loc[:,['influence', 'std']].values,
+                                           expected_nodes.loc[:,['influence', 'std']].values, rtol = 0, atol = 1e-12)
+
+#The sweep only supports the default computing_influence on the vectorized engine.
+def test_sweep_functions():
+    E, X = random_graph()
+    with pytest.raises(ValueError):
+        influence_sweep(E, X, engine = 'pandas')
+    with pytest.raises(ValueError):
+        influence_sweep(E, X, computing_influence = lambda *args : 0.0)
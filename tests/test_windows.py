@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import sinfpy.semantic_influence as sinf
+
+from test_engines import random_graph
+
+RANGES = [None, (1, 6), (2, 4), (3, None), (None, 2), (4, 4), (2.5, 5.5)]
+
+#The edges and properties within time_range, given as (first, last) with both ends included.
+def in_range(table, time_range, timeframe = 'timeframe'):
+    first, last = (None, None) if time_range is None else time_range
+    selected = np.ones(len(table), dtype = bool)
+    if first is not None:
+        selected &= table.loc[:,timeframe].values >= first
+    if last is not None:
+        selected &= table.loc[:,timeframe].values <= last
+    return table[selected]
+
+#The influence over every time range is the one computed on the edges and properties of the range only.
+@pytest.mark.parametrize('dynamic', [True, False])
+@pytest.mark.parametrize('balance_inf', [True, False])
+def test_windows(dynamic, balance_inf):
+    E, X = random_graph()
+    if not dynamic:
+        E = E.drop_duplicates(['p1', 'p2']).loc[:,['p1', 'p2']]
+    windows = sinf.EdgeInfluence(E, X, threshold = 0.5, dynamic = dynamic, balance_inf = balance_inf).windows()
+
+    for time_range in RANGES:
+        E_range = in_range(E, time_range) if dynamic else E
+        expected_E = sinf.EdgeInfluence(E_range, in_range(X, time_range), threshold = 0.5, dynamic = dynamic,
+                                        balance_inf = balance_inf)(executor = 'serial')
+        expected_nodes = sinf.NodeInfluence(expected_E, stats = True)(executor = 'serial')
+
+        edges = windows.edges(time_range)
+        assert (edges.loc[:,['p1', 'p2']].values == expected_E.loc[:,['p1', 'p2']].values).all()
+        np.testing.assert_allclose(edges.influence.values, expected_E.influence.values, rtol = 0, atol = 1e-12)
+        nodes = windows.nodes(time_range, stats = True)
+        assert (nodes.node.values == expected_nodes.node.values).all()
+        assert (nodes.n_peaks.values == expected_nodes.n_peaks.values).all()
+        np.testing.assert_allclose(nodes.loc[:,['influence', 'std']].values,
+                                   expected_nodes.loc[:,['influence', 'std']].values, rtol = 0, atol = 1e-12)
+
+#The rolling windows are the node influence over the last timeframes at every timeframe.
+def test_rolling():
+    E, X = random_graph()
+    windows = sinf.EdgeInfluence(E, X, threshold = 0.5).windows()
+    rolling = windows.rolling(3)
+    expected = pd.concat([windows.nodes((max(end - 2, 1), end)).assign(timeframe = float(end))
+                          for end in range(1, 7)], ignore_index = True)
+    assert (rolling.loc[:,['timeframe', 'node']].values == expected.loc[:,['timeframe', 'node']].values).all()
+    np.testing.assert_allclose(rolling.influence.values, expected.influence.values, rtol = 0, atol = 1e-15)